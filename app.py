@@ -1,48 +1,162 @@
-from flask import Flask, render_template, jsonify, request, session, send_from_directory
+from flask import Blueprint, Flask, current_app, render_template, jsonify, request, session
 from flask_cors import CORS
-import sqlite3
+from werkzeug.local import LocalProxy
+import bisect
+import functools
 import json
 import os
 from datetime import datetime
 import uuid
-from simulados_system_v2_improved import SimuladosSystemV2Improved
-
-# Instanciar o sistema de simulados
-simulados_system_v2 = SimuladosSystemV2Improved()
-
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'inteli_simulados_2024_dev')  # Chave secreta para sessões
-
-# Configurar CORS para permitir requisições do frontend
-CORS(app, supports_credentials=True, origins=['http://localhost:5000', 'http://127.0.0.1:5000'])
-
-# Configurações para lidar com respostas grandes
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB
-app.config['JSON_SORT_KEYS'] = False
-app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
-app.config['JSONIFY_MIMETYPE'] = 'application/json'
-app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
-
-# Configurações de sessão
-app.config['SESSION_COOKIE_SECURE'] = False
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['PERMANENT_SESSION_LIFETIME'] = 1800  # 30 minutos
+import fast_start
+import metrics
+from db_executor import BlockingExecutor
+from compression import PageCache, compress_response, compressed_response
+from db_pool import DB_PATH, get_pool
+from grading import grade
+from question_catalog import get_catalog, question_payload
+from response_cache import VersionedResponseCache, cached_json_response
+from simulado_results import HISTORY_PAGE_SIZE, RESULT_FIELDS, decode_cursor
+from simulado_store import ActiveSimuladoStore
+from static_assets import asset_url, send_asset, send_image_variant
+from simulados_system_v2_improved import get_system
+
+class AppServices:
+    """Dependências de uma instância do app, criadas em create_app"""
+
+    def __init__(self, db_path):
+        # Instanciar o sistema de simulados (prepara o esquema uma vez por processo)
+        self.system = get_system(db_path)
+        # Simulados em andamento ficam no servidor; o cookie guarda apenas o user_id
+        self.active_simulados = ActiveSimuladoStore(db_path)
+        self.db_pool = get_pool(db_path)
+        self.catalog = get_catalog(db_path)
+        # Respostas de listagem de provas, recalculadas só quando os dados mudam
+        self.response_cache = VersionedResponseCache()
+        # Páginas renderizadas e suas versões comprimidas
+        self.page_cache = PageCache()
+
+def _service(name):
+    return LocalProxy(lambda: getattr(current_app.extensions['simulados'], name))
+
+# Dependências do app da requisição atual
+simulados_system_v2 = _service('system')
+active_simulados = _service('active_simulados')
+db_pool = _service('db_pool')
+question_catalog = _service('catalog')
+response_cache = _service('response_cache')
+page_cache = _service('page_cache')
+
+EXAMS_MAX_AGE = 60
+
+# Páginas servidas pelo app (pré-renderizadas e comprimidas no build)
+PAGE_TEMPLATES = ('dashboard.html', 'index.html')
+
+bp = Blueprint('main', __name__)
+
+def create_app(db_path=DB_PATH, config=None):
+    """Cria a aplicação Flask.
+
+    Importar este módulo não toca no banco: o esquema é preparado aqui, na
+    primeira criação do app em cada processo. Em workers gevent as views
+    rodam em um pool limitado de threads reais (db_executor), então o
+    sqlite3 não bloqueia as demais conexões do worker.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get('SECRET_KEY', 'inteli_simulados_2024_dev')  # Chave secreta para sessões
+
+    # Configurar CORS para permitir requisições do frontend
+    CORS(app, supports_credentials=True, origins=['http://localhost:5000', 'http://127.0.0.1:5000'],
+         expose_headers=['X-Next-Cursor'])
+
+    # Configurações para lidar com respostas grandes
+    app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB
+    app.config['JSON_SORT_KEYS'] = False
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    app.config['JSONIFY_MIMETYPE'] = 'application/json'
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
+
+    # Configurações de sessão
+    app.config['SESSION_COOKIE_SECURE'] = False
+    app.config['SESSION_COOKIE_HTTPONLY'] = True
+    app.config['PERMANENT_SESSION_LIFETIME'] = 1800  # 30 minutos
+    if config:
+        app.config.update(config)
+
+    services = app.extensions['simulados'] = AppServices(db_path)
+    if fast_start.enabled():
+        # Templates do cache de bytecode e catálogo do snapshot em disco
+        fast_start.configure(app)
+        services.catalog.snapshot_path = fast_start.catalog_snapshot_path(db_path)
+    # Carrega o catálogo de questões já na inicialização
+    services.catalog.snapshot()
+
+    app.view_functions['static'] = serve_static
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.register_blueprint(bp)
+
+    executor = BlockingExecutor()
+    if executor.offloading:
+        for endpoint, view in list(app.view_functions.items()):
+            app.view_functions[endpoint] = executor.wrap(view)
+    return app
+
+@functools.lru_cache(maxsize=None)
+def default_app():
+    """App padrão (questions.db), criado no primeiro uso"""
+    return create_app()
+
+def __getattr__(name):
+    # `from app import app` e `gunicorn app:app` continuam funcionando
+    if name == 'app':
+        return default_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ----------------------
 # Helpers
 # ----------------------
 
 def get_db_connection():
-    conn = sqlite3.connect('questions.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Conexão da thread atual, emprestada do pool (não deve ser fechada)"""
+    return db_pool.get()
+
+def get_active_simulado():
+    """Simulado em andamento do usuário da sessão (ou None)"""
+    return active_simulados.get(session.get('user_id'))
+
+def simulado_questions(current):
+    """Lista [{id, bloco, gabarito}] do simulado ativo, com gabarito do catálogo"""
+    catalog = question_catalog.snapshot()
+    questions = []
+    for qid, bloco in zip(current['question_ids'], current['blocos']):
+        q = catalog.get(qid)
+        questions.append({
+            'id': qid,
+            'bloco': bloco,
+            'gabarito': (q['gabarito'] if q else '') or '?'
+        })
+    return questions
+
+# Latência, consultas SQL e tamanho de cada resposta (GET /metrics).
+# Registrado antes de compress_json para medir a resposta já comprimida.
+@bp.before_app_request
+def start_metrics():
+    metrics.start_request()
+
+@bp.after_app_request
+def finish_metrics(response):
+    return metrics.finish_request(response)
 
 # Gera um identificador de usuário anônimo por sessão, se não existir
-@app.before_request
+@bp.before_app_request
 def ensure_user_id():
     if 'user_id' not in session:
         session['user_id'] = uuid.uuid4().hex
 
+# Respostas JSON grandes (e a listagem em streaming) saem comprimidas
+@bp.after_app_request
+def compress_json(response):
+    return compress_response(response, request.accept_encodings)
+
 # ----------------------
 # Static serving for question images stored on disk
 # ----------------------
@@ -50,30 +164,45 @@ def ensure_user_id():
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def _serve_from(subdir, filename):
-    safe_filename = filename.replace('\\', '/').lstrip('/')
-    return send_from_directory(os.path.join(BASE_DIR, subdir), safe_filename)
+    # ETag forte + cache imutável quando o nome traz o fingerprint de conteúdo
+    return send_asset(subdir, filename)
+
+def serve_static(filename):
+    return send_asset('static', filename)
 
-@app.route('/2025_questions_imgs/<path:filename>')
+@bp.app_url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """url_for('static', filename=...) passa a gerar o nome com fingerprint"""
+    if endpoint == 'static' and 'filename' in values:
+        fingerprinted = asset_url(f"static/{values['filename']}")
+        values['filename'] = fingerprinted[len('static/'):]
+
+@bp.route('/2025_questions_imgs/<path:filename>')
 def serve_2025_asset(filename):
     return _serve_from('2025_questions_imgs', filename)
 
-@app.route('/2024_questions_imgs/<path:filename>')
+@bp.route('/2024_questions_imgs/<path:filename>')
 def serve_2024_asset(filename):
     return _serve_from('2024_questions_imgs', filename)
 
-@app.route('/2023_questions_imgs/<path:filename>')
+@bp.route('/2023_questions_imgs/<path:filename>')
 def serve_2023_asset(filename):
     return _serve_from('2023_questions_imgs', filename)
 
-@app.route('/2022_questions_imgs/<path:filename>')
+@bp.route('/2022_questions_imgs/<path:filename>')
 def serve_2022_asset(filename):
     return _serve_from('2022_questions_imgs', filename)
 
-@app.route('/simulados/<path:filename>')
+@bp.route('/img/<path:filename>')
+def serve_responsive_image(filename):
+    # Variante WebP/AVIF redimensionada conforme Accept e dicas de largura
+    return send_image_variant(filename)
+
+@bp.route('/simulados/<path:filename>')
 def serve_gabaritos(filename):
     return _serve_from('simulados', filename)
 
-@app.route('/questions_alts/<path:filename>')
+@bp.route('/questions_alts/<path:filename>')
 def serve_questions_alts(filename):
     return _serve_from('questions_alts', filename)
 
@@ -81,15 +210,27 @@ def serve_questions_alts(filename):
 # Páginas
 # ----------------------
 
-@app.route('/')
+def send_page(template_name):
+    """Página HTML com ETag; as versões comprimidas são calculadas uma vez por conteúdo"""
+    page = page_cache.get(render_template(template_name).encode('utf-8'))
+    response = compressed_response(page, 'text/html')
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@bp.route('/')
 def index():
-    return render_template('dashboard.html')
+    return send_page('dashboard.html')
 
-@app.route('/test')
+@bp.route('/test')
 def test():
-    return render_template('index.html')
+    return send_page('index.html')
+
+@bp.route('/metrics')
+def get_metrics():
+    """Métricas do processo no formato texto do Prometheus"""
+    return metrics.metrics_response()
 
-@app.route('/api/test')
+@bp.route('/api/test')
 def test_api():
     """Rota de teste para verificar se a API está funcionando"""
     return jsonify({
@@ -102,34 +243,77 @@ def test_api():
 # Questões (CRUD leve)
 # ----------------------
 
-@app.route('/api/questions')
+# Campos da listagem de questões e limite de tamanho dos textos
+QUESTION_LIST_FIELDS = ('id', 'enunciado', 'a', 'b', 'c', 'd', 'e', 'gabarito', 'fonte', 'imagens')
+QUESTION_LIST_LIMITS = {'enunciado': 300, 'a': 100, 'b': 100, 'c': 100, 'd': 100, 'e': 100}
+MAX_QUESTIONS_PAGE_SIZE = 1000
+
+def question_list_item(q, fields):
+    item = {}
+    for field in fields:
+        if field == 'imagens':
+            item[field] = '[]'  # Não retornar imagens nesta rota
+        elif field == 'enunciado':
+            item[field] = (q['enunciado'] or f"Questão {q['id']}")[:QUESTION_LIST_LIMITS[field]]
+        elif field in QUESTION_LIST_LIMITS:
+            item[field] = (q[field] or '')[:QUESTION_LIST_LIMITS[field]]
+        else:
+            item[field] = q[field]
+    return item
+
+@bp.route('/api/questions')
 def get_questions():
-    conn = get_db_connection()
-    questions = conn.execute('SELECT * FROM questoes').fetchall()
-    conn.close()
-
-    questions_list = []
-    for q in questions:
-        # Limitar tamanho dos dados para evitar respostas muito grandes
-        questions_list.append({
-            'id': q['id'],
-            'enunciado': (q['enunciado'] or f"Questão {q['id']}")[:300],
-            'a': (q['a'] or '')[:100],
-            'b': (q['b'] or '')[:100],
-            'c': (q['c'] or '')[:100],
-            'd': (q['d'] or '')[:100],
-            'e': (q['e'] or '')[:100],
-            'gabarito': q['gabarito'],
-            'fonte': q['fonte'],
-            'imagens': '[]'  # Não retornar imagens nesta rota
-        })
-    return jsonify(questions_list)
+    """Listagem de questões enviada em streaming, uma questão por vez.
+
+    Parâmetros: fields, fonte, after_id e limit (até 1000; sem limit, todas
+    as questões). Com `format=ndjson` (ou Accept: application/x-ndjson) cada
+    linha é um objeto; senão o corpo é a lista JSON. Havendo mais questões,
+    o cabeçalho X-Next-Cursor traz o `after_id` da próxima página.
+    """
+    try:
+        fields = parse_fields(QUESTION_LIST_FIELDS) or QUESTION_LIST_FIELDS
+        after_id = request.args.get('after_id', 0, type=int)
+        limit = request.args.get('limit', type=int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    catalog = question_catalog.snapshot()
+    fonte = request.args.get('fonte')
+    ids = catalog.ids_for(fonte) if fonte else catalog.ids
+    ids = ids[bisect.bisect_right(ids, after_id):]
+    next_cursor = None
+    if limit is not None:
+        limit = max(1, min(limit, MAX_QUESTIONS_PAGE_SIZE))
+        if len(ids) > limit:
+            ids = ids[:limit]
+            next_cursor = str(ids[-1])
+
+    ndjson = request.args.get('format') == 'ndjson' or (
+        request.accept_mimetypes.best == 'application/x-ndjson'
+    )
 
-@app.route('/api/questions/<int:question_id>')
+    def generate():
+        if not ndjson:
+            yield '['
+        for i, qid in enumerate(ids):
+            line = json.dumps(question_list_item(catalog.get(qid), fields), ensure_ascii=False)
+            if ndjson:
+                yield line + '\n'
+            else:
+                yield line if i == 0 else ',' + line
+        if not ndjson:
+            yield ']'
+
+    response = current_app.response_class(
+        generate(), mimetype='application/x-ndjson' if ndjson else 'application/json'
+    )
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@bp.route('/api/questions/<int:question_id>')
 def get_question(question_id):
-    conn = get_db_connection()
-    question = conn.execute('SELECT * FROM questoes WHERE id = ?', (question_id,)).fetchone()
-    conn.close()
+    question = question_catalog.snapshot().get(question_id)
     if not question:
         return jsonify({'error': 'Questão não encontrada'}), 404
     
@@ -151,50 +335,43 @@ def get_question(question_id):
 # Imagens das questões
 # ----------------------
 
-@app.route('/api/images/<int:question_id>')
+@bp.route('/api/images/<int:question_id>')
 def get_question_images(question_id):
-    conn = get_db_connection()
-    row = conn.execute('SELECT imagens FROM questoes WHERE id = ?', (question_id,)).fetchone()
-    conn.close()
-    if row and row['imagens']:
-        try:
-            return jsonify(json.loads(row['imagens']))
-        except json.JSONDecodeError:
-            return jsonify([])
-    return jsonify([])
-
-@app.route('/api/images/<int:question_id>/<int:image_index>')
+    return jsonify(list(question_catalog.snapshot().images.get(question_id, ())))
+
+@bp.route('/api/images/<int:question_id>/<int:image_index>')
 def get_question_image(question_id, image_index):
-    conn = get_db_connection()
-    row = conn.execute('SELECT imagens FROM questoes WHERE id = ?', (question_id,)).fetchone()
-    conn.close()
-    if row and row['imagens']:
-        try:
-            images = json.loads(row['imagens'])
-            if 0 <= image_index < len(images):
-                img = images[image_index]
-                return jsonify({
-                    'base64': img.get('base64') or img.get('data') or '',
-                    'filename': img.get('filename', ''),
-                    'size': img.get('size', 0),
-                })
-        except json.JSONDecodeError:
-            pass
+    images = question_catalog.snapshot().images.get(question_id, ())
+    if 0 <= image_index < len(images):
+        img = images[image_index]
+        if isinstance(img, dict):
+            return jsonify({
+                'base64': img.get('base64') or img.get('data') or '',
+                'filename': img.get('filename', ''),
+                'size': img.get('size', 0),
+            })
     return jsonify({'error': 'Imagem não encontrada'}), 404
 
 # ----------------------
 # NOVAS ROTAS: provas & simulados (frontend depende destas)
 # ----------------------
 
-@app.route('/api/exams/available')
+@bp.route('/api/exams/available')
 def get_available_exams():
-    return jsonify(simulados_system_v2.get_available_exams())
+    # Muda só quando um importador escreve em `questoes` (versão do catálogo)
+    entry = response_cache.get(
+        'exams/available', question_catalog.snapshot().version, simulados_system_v2.get_available_exams
+    )
+    return cached_json_response(entry, max_age=EXAMS_MAX_AGE)
 
-@app.route('/api/exams/statistics')
+@bp.route('/api/exams/statistics')
 def get_exam_statistics():
-    return jsonify(simulados_system_v2.get_exam_statistics())
+    entry = response_cache.get(
+        'exams/statistics', simulados_system_v2.get_exam_statistics_version(), simulados_system_v2.get_exam_statistics
+    )
+    return cached_json_response(entry)
 
-@app.route('/api/simulados/create', methods=['POST'])
+@bp.route('/api/simulados/create', methods=['POST'])
 def create_simulado():
     try:
         # Verificar se a requisição tem JSON válido
@@ -209,9 +386,6 @@ def create_simulado():
         exam_distribution = data.get('exam_distribution', None)
         num_questions = data.get('num_questions', 24)
         
-        # Log para debug
-        print(f"Criando simulado com: {len(selected_exams)} provas, {num_questions} questões")
-        
         if not selected_exams:
             return jsonify({'error': 'Nenhuma prova selecionada'}), 400
 
@@ -242,34 +416,16 @@ def create_simulado():
                 'error': f'Questões insuficientes. Apenas {len(questions) if questions else 0} disponíveis; são necessárias {num_questions}.'
             }), 400
 
-        # Salva versão ENXUTA na sessão (sem imagens e com texto limitado)
-        simplified = []
-        for q in questions:
-            # Limitar tamanho do enunciado e alternativas
-            enunciado = q['enunciado'][:500] if q['enunciado'] else f"Questão {q['id']}"
-            a = q['a'][:1000] if q['a'] else ''
-            b = q['b'][:1000] if q['b'] else ''
-            c = q['c'][:1000] if q['c'] else ''
-            d = q['d'][:1000] if q['d'] else ''
-            e = q['e'][:1000] if q['e'] else ''
-            
-            simplified.append({
-                'id': q['id'],
-                'enunciado': enunciado,
-                'a': a, 'b': b, 'c': c, 'd': d, 'e': e,
-                'gabarito': q['gabarito'],
-                'fonte': q['fonte'],
-                'tipo': q.get('tipo', 'completa'),
-                'bloco': q.get('bloco', 1)
-            })
-            
-        # Salvar apenas dados essenciais na sessão
-        session['current_simulado'] = {
-            'questions': simplified,
-            'selected_exams': selected_exams,
-            'num_questoes': len(questions),
-            'start_time': datetime.now().isoformat(),
-        }
+        # Salva no servidor apenas ids, blocos e horário de início
+        active_simulados.put(
+            session['user_id'],
+            [q['id'] for q in questions],
+            [q.get('bloco', 1) for q in questions],
+            selected_exams,
+            datetime.now().isoformat(),
+        )
+        # Remove simulado legado gravado no cookie, se existir
+        session.pop('current_simulado', None)
         
         # Retornar resposta mínima
         return jsonify({
@@ -286,76 +442,19 @@ def create_simulado():
             'error': f'Erro interno ao criar simulado: {str(e)}'
         }), 500
 
-@app.route('/api/simulados/current')
+@bp.route('/api/simulados/current')
 def get_current_simulado():
     try:
-        current = session.get('current_simulado')
+        current = get_active_simulado()
         if not current:
             return jsonify({'error': 'Nenhum simulado ativo'}), 404
 
-        # Verifica se há questões na sessão
-        if not current.get('questions') or len(current.get('questions', [])) == 0:
+        # Verifica se há questões no simulado ativo
+        if not current.get('question_ids'):
             return jsonify({'error': 'Simulado sem questões'}), 404
 
-        # Completa com dados do banco (inclui imagens)
-        conn = sqlite3.connect('questions.db')
-        cursor = conn.cursor()
-        cursor.execute('PRAGMA table_info(questoes)')
-        cols = [c[1] for c in cursor.fetchall()]
-
-        filled = []
-        for q in current.get('questions', []):
-            qid = q.get('id')
-            if not qid:
-                continue
-            try:
-                if 'enunciado' in cols:
-                    if 'tipo' in cols:
-                        cursor.execute('''
-                            SELECT id, enunciado, a, b, c, d, e, gabarito, fonte, imagens, tipo
-                            FROM questoes WHERE id = ?
-                        ''', (qid,))
-                    else:
-                        cursor.execute('''
-                            SELECT id, enunciado, a, b, c, d, e, gabarito, fonte, imagens
-                            FROM questoes WHERE id = ?
-                        ''', (qid,))
-                else:
-                    cursor.execute('''
-                        SELECT id, a, b, c, d, e, gabarito, fonte, imagens
-                        FROM questoes WHERE id = ?
-                    ''', (qid,))
-                row = cursor.fetchone()
-                if not row:
-                    print(f"Questão {qid} não encontrada no banco")
-                    continue
-                # Monta objeto homogêneo
-                if 'enunciado' in cols:
-                    if 'tipo' in cols and len(row) > 10:
-                        filled.append({
-                            'id': row[0], 'enunciado': row[1] or '',
-                            'a': row[2] or '', 'b': row[3] or '', 'c': row[4] or '', 'd': row[5] or '', 'e': row[6] or '',
-                            'gabarito': row[7] or '', 'fonte': row[8] or '', 'imagens': row[9] or '[]',
-                            'tipo': row[10] or 'completa', 'bloco': q.get('bloco', 1)
-                        })
-                    else:
-                        filled.append({
-                            'id': row[0], 'enunciado': row[1] or '',
-                            'a': row[2] or '', 'b': row[3] or '', 'c': row[4] or '', 'd': row[5] or '', 'e': row[6] or '',
-                            'gabarito': row[7] or '', 'fonte': row[8] or '', 'imagens': row[9] or '[]',
-                            'tipo': 'completa', 'bloco': q.get('bloco', 1)
-                        })
-                else:
-                    filled.append({
-                        'id': row[0], 'enunciado': row[1] or '',
-                        'a': row[2] or '', 'b': row[3] or '', 'c': row[4] or '', 'd': row[5] or '', 'e': row[6] or '',
-                        'gabarito': row[7] or '', 'fonte': row[8] or '', 'imagens': row[9] or '[]',
-                        'tipo': 'completa', 'bloco': q.get('bloco', 1)
-                    })
-            except Exception as e:
-                print(f"Erro ao processar questão {qid}: {e}")
-                continue
-        conn.close()
+        # Completa com os dados do catálogo em memória (inclui imagens), em uma única passada
+        filled = question_catalog.snapshot().hydrate(current['question_ids'], current['blocos'])
 
         # Verifica se conseguiu carregar pelo menos uma questão
         if len(filled) == 0:
@@ -371,119 +470,72 @@ def get_current_simulado():
         print(f"Erro em get_current_simulado: {e}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
-@app.route('/api/simulados/question/<int:question_id>')
+@bp.route('/api/simulados/question/<int:question_id>')
 def get_simulado_question(question_id):
     """Retorna uma questão (com imagens). Não depende mais de sessão, para evitar 500."""
-    conn = sqlite3.connect('questions.db')
-    cursor = conn.cursor()
-    cursor.execute('PRAGMA table_info(questoes)')
-    cols = [c[1] for c in cursor.fetchall()]
-
-    if 'enunciado' in cols:
-        if 'tipo' in cols:
-            cursor.execute('''
-                SELECT id, enunciado, a, b, c, d, e, gabarito, fonte, imagens, tipo
-                FROM questoes WHERE id = ?
-            ''', (question_id,))
-        else:
-            cursor.execute('''
-                SELECT id, enunciado, a, b, c, d, e, gabarito, fonte, imagens
-                FROM questoes WHERE id = ?
-            ''', (question_id,))
-    else:
-        cursor.execute('''
-            SELECT id, a, b, c, d, e, gabarito, fonte, imagens
-            FROM questoes WHERE id = ?
-        ''', (question_id,))
-
-    row = cursor.fetchone()
-    conn.close()
-    if not row:
+    q = question_catalog.snapshot().get(question_id)
+    if not q:
         return jsonify({'error': 'Questão não encontrada'}), 404
 
-    if 'enunciado' in cols:
-        if 'tipo' in cols and len(row) > 10:
-            return jsonify({
-                'id': row[0], 'enunciado': row[1] or '',
-                'a': row[2] or '', 'b': row[3] or '', 'c': row[4] or '', 'd': row[5] or '', 'e': row[6] or '',
-                'gabarito': row[7] or '', 'fonte': row[8] or '', 'imagens': row[9] or '[]',
-                'tipo': row[10] or 'completa'
-            })
-        else:
-            return jsonify({
-                'id': row[0], 'enunciado': row[1] or '',
-                'a': row[2] or '', 'b': row[3] or '', 'c': row[4] or '', 'd': row[5] or '', 'e': row[6] or '',
-                'gabarito': row[7] or '', 'fonte': row[8] or '', 'imagens': row[9] or '[]',
-                'tipo': 'completa'
-            })
-    else:
-        return jsonify({
-            'id': row[0], 'enunciado': row[1] or '',
-            'a': row[2] or '', 'b': row[3] or '', 'c': row[4] or '', 'd': row[5] or '', 'e': row[6] or '',
-            'gabarito': row[7] or '', 'fonte': row[8] or '', 'imagens': row[9] or '[]',
-            'tipo': 'completa'
-        })
+    return jsonify(question_payload(q))
+
+# Limite de ids por requisição em /api/simulados/questions
+MAX_BATCH_QUESTIONS = 200
+
+@bp.route('/api/simulados/questions')
+def get_simulado_questions_batch():
+    """Retorna várias questões (com imagens) em uma única resposta: ?ids=1,2,3"""
+    raw_ids = [part for part in request.args.get('ids', '').split(',') if part.strip()]
+    if not raw_ids:
+        return jsonify({'error': 'Parâmetro ids é obrigatório'}), 400
+    if len(raw_ids) > MAX_BATCH_QUESTIONS:
+        return jsonify({'error': f'Máximo de {MAX_BATCH_QUESTIONS} questões por requisição'}), 400
+    try:
+        question_ids = [int(part) for part in raw_ids]
+    except ValueError:
+        return jsonify({'error': 'ids deve ser uma lista de inteiros separados por vírgula'}), 400
+
+    catalog = question_catalog.snapshot()
+    questions = catalog.hydrate(question_ids)
+    found = {q['id'] for q in questions}
+    return jsonify({
+        'questions': questions,
+        'missing': [qid for qid in question_ids if qid not in found]
+    })
 
-@app.route('/api/simulados/submit', methods=['POST'])
+@bp.route('/api/simulados/submit', methods=['POST'])
 def submit_simulado():
     data = request.get_json() or {}
-    current = session.get('current_simulado')
+    current = get_active_simulado()
     if not current:
         return jsonify({'error': 'Nenhum simulado ativo'}), 400
+    current['questions'] = simulado_questions(current)
 
     answers = data.get('answers', {})
     skipped = data.get('skipped_questions', [])
 
     total = current['num_questoes']
-    correct = 0
-    wrong = 0
-
-    for qid, ans in answers.items():
-        q = next((q for q in current['questions'] if str(q['id']) == str(qid)), None)
-        if q and (ans or '').lower() == (q['gabarito'] or '').lower():
-            correct += 1
-        else:
-            wrong += 1
+    graded = grade(current['questions'], answers, skipped)
+    correct = graded['correct']
+    wrong = graded['wrong']
 
     start_time = datetime.fromisoformat(current['start_time'])
     time_used = str(datetime.now() - start_time).split('.')[0]
 
-    # Montar detalhes por questão e acertos por bloco
-    question_details = []
-    accuracies = [0, 0, 0, 0]
-    for i, q in enumerate(current['questions']):
-        original_answer = answers.get(str(q['id'])) or answers.get(q['id'])
-        is_correct = (original_answer or '').lower() == (q['gabarito'] or '').lower()
-        bloco = q.get('bloco', 1)
-        if is_correct and isinstance(bloco, int) and 1 <= bloco <= 4:
-            accuracies[bloco - 1] += 1
-        question_details.append({
-            'id': q['id'],
-            'bloco': bloco,
-            'numero': i + 1,
-            'gabarito': q['gabarito'],
-            'resposta': original_answer or None,
-            'correta': is_correct,
-            'pulada': i in skipped
-        })
-
     simulado_id = simulados_system_v2.save_simulado_result(
         current['selected_exams'], total, [q['id'] for q in current['questions']],
-        time_used, correct, wrong, len(skipped),
-        details={
-            'questions': question_details,
-            'accuracies': accuracies
-        },
+        time_used, correct, wrong, graded['skipped'],
+        details=graded['details'],
         user_id=session.get('user_id')
     )
 
-    session.pop('current_simulado', None)
+    active_simulados.pop(session.get('user_id'))
 
     results_data = {
         'total_questions': total,
         'correct_answers': correct,
         'incorrect_answers': wrong,
-        'skipped_questions': len(skipped),
+        'skipped_questions': graded['skipped'],
         'time_used': time_used,
         'percentage': round((correct / total) * 100, 2),
         'simulado_id': simulado_id
@@ -497,19 +549,75 @@ def submit_simulado():
         'redirect_url': f'/?results={results_encoded}'
     })
 
-@app.route('/api/simulados/history')
+def parse_fields(allowed=RESULT_FIELDS):
+    """Lê ?fields=a,b,c (None = todos); ValueError para campos desconhecidos"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}")
+    return fields
+
+def parse_iso_date(name):
+    """Lê uma data/hora ISO da query string (None se ausente)"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} deve ser uma data ISO (ex.: 2025-01-31)")
+    return value
+
+@bp.route('/api/simulados/history')
 def get_simulados_history():
-    return jsonify(simulados_system_v2.get_simulados_history(user_id=session.get('user_id')))
+    """Histórico paginado por cursor.
+
+    Parâmetros: limit (até 200), cursor (cabeçalho X-Next-Cursor da página
+    anterior), fields, since/until (ISO, until exclusivo) e fonte. O corpo
+    continua sendo a lista de simulados.
+    """
+    try:
+        filters = {
+            'limit': request.args.get('limit', HISTORY_PAGE_SIZE, type=int),
+            'cursor': request.args.get('cursor') or None,
+            'fields': parse_fields(),
+            'since': parse_iso_date('since'),
+            'until': parse_iso_date('until'),
+            'fonte': request.args.get('fonte') or None,
+        }
+        if filters['cursor']:
+            decode_cursor(filters['cursor'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-@app.route('/api/simulados/history/<int:simulado_id>')
+    simulados, next_cursor = simulados_system_v2.get_simulados_history_page(
+        user_id=session.get('user_id'), **filters
+    )
+    response = jsonify(simulados)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@bp.route('/api/simulados/history/<int:simulado_id>')
 def get_simulado_by_id(simulado_id):
-    simulado = simulados_system_v2.get_simulado_by_id(simulado_id, user_id=session.get('user_id'))
+    try:
+        fields = parse_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    simulado = simulados_system_v2.get_simulado_by_id(simulado_id, user_id=session.get('user_id'), fields=fields)
     if simulado:
         return jsonify(simulado)
     else:
         return jsonify({'error': 'Simulado não encontrado'}), 404
 
-@app.route('/api/simulados/statistics')
+@bp.route('/api/simulados/analytics')
+def get_simulados_analytics():
+    return jsonify(simulados_system_v2.get_user_analytics(session.get('user_id')))
+
+@bp.route('/api/simulados/statistics')
 def get_simulados_statistics():
     return jsonify(simulados_system_v2.get_statistics())
 
@@ -518,4 +626,4 @@ def get_simulados_statistics():
 # ----------------------
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
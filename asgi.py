@@ -0,0 +1,16 @@
+"""
+Ponto de entrada ASGI (ex.: uvicorn asgi:app).
+
+O app Flask é servido pelo adaptador a2wsgi: o event loop mantém as
+conexões abertas e cada requisição roda em um pool de no máximo
+DB_WORKERS threads, onde ficam as chamadas bloqueantes ao sqlite3.
+
+Dependências (a2wsgi e uvicorn): pip install -r requirements-async.txt
+"""
+
+from a2wsgi import WSGIMiddleware
+
+from app import create_app
+from db_executor import DB_WORKERS
+
+app = WSGIMiddleware(create_app(), workers=DB_WORKERS)
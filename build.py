@@ -4,22 +4,46 @@ Script de build para otimização do InteliDaily
 Inclui minificação de CSS e JS, otimização de imagens e outras melhorias
 """
 
+import hashlib
+import json
 import os
+import shutil
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
+from static_assets import AssetFingerprints
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_FILE = os.path.join(BASE_DIR, '.cache', 'build_manifest.json')
+
+# Versão do formato do manifesto (mudar força um build completo)
+MANIFEST_FORMAT = 1
+
+IMAGE_DIRS = ["2022_questions_imgs", "2023_questions_imgs", "2024_questions_imgs", "2025_questions_imgs"]
+
+# Arquivos minificados usados pelos templates otimizados
+MINIFIED_ASSETS = {"style.css": "style.min.css", "script.js": "script.min.js"}
+
 def run_command(command, description):
-    """Executa um comando e trata erros"""
+    """Executa um comando (lista de argumentos, sem shell) e trata erros"""
     print(f"🔄 {description}...")
+    # shutil.which resolve também npx.cmd/npm.cmd no Windows
+    executable = shutil.which(command[0])
+    if executable is None:
+        print(f"❌ Erro ao {description.lower()}: {command[0]} não encontrado")
+        return False
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        subprocess.run([executable, *command[1:]], check=True, capture_output=True, text=True, cwd=BASE_DIR)
         print(f"✅ {description} concluído com sucesso!")
         return True
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, OSError) as e:
         print(f"❌ Erro ao {description.lower()}:")
-        print(f"   Comando: {command}")
-        print(f"   Erro: {e.stderr}")
+        print(f"   Comando: {' '.join(command)}")
+        print(f"   Erro: {getattr(e, 'stderr', None) or e}")
         return False
 
 def check_dependencies():
@@ -27,26 +51,29 @@ def check_dependencies():
     print("🔍 Verificando dependências...")
     
     # Verificar se Node.js está instalado
-    if not run_command("node --version", "Verificar Node.js"):
+    if not run_command(["node", "--version"], "Verificar Node.js"):
         print("❌ Node.js não encontrado. Instale Node.js primeiro.")
         return False
     
     # Verificar se npm está disponível
-    if not run_command("npm --version", "Verificar npm"):
+    if not run_command(["npm", "--version"], "Verificar npm"):
         print("❌ npm não encontrado. Instale npm primeiro.")
         return False
     
     return True
 
 def install_dependencies():
-    """Instala as dependências do npm"""
+    """Verifica Node.js/npm e instala as dependências do npm"""
+    if not check_dependencies():
+        return False
+    
     print("📦 Instalando dependências...")
     
     if not os.path.exists("package.json"):
         print("❌ package.json não encontrado!")
         return False
     
-    return run_command("npm install", "Instalar dependências do npm")
+    return run_command(["npm", "install"], "Instalar dependências do npm")
 
 def build_css():
     """Minifica e otimiza o CSS usando LightningCSS"""
@@ -60,7 +87,7 @@ def build_css():
         return False
     
     # Comando LightningCSS para minificar e otimizar
-    command = f"npx lightningcss --minify --bundle {css_file} -o {output_file}"
+    command = ["npx", "lightningcss", "--minify", "--bundle", css_file, "-o", output_file]
     return run_command(command, "Minificar CSS com LightningCSS")
 
 def build_js():
@@ -75,47 +102,220 @@ def build_js():
         return False
     
     # Comando Terser para minificar
-    command = f"npx terser {js_file} -o {output_file} -c -m"
+    command = ["npx", "terser", js_file, "-o", output_file, "-c", "-m"]
     return run_command(command, "Minificar JavaScript com Terser")
 
 def optimize_images():
-    """Otimiza imagens (se tiver ferramentas disponíveis)"""
-    print("🖼️ Verificando otimização de imagens...")
+    """Gera variantes responsivas (WebP/AVIF em várias larguras) das imagens"""
+    print("🖼️ Gerando variantes responsivas das imagens...")
     
     # Verificar se tem imagens para otimizar
-    image_dirs = ["2022_questions_imgs", "2023_questions_imgs", "2024_questions_imgs", "2025_questions_imgs"]
-    has_images = any(os.path.exists(d) for d in image_dirs)
+    has_images = any(os.path.exists(d) for d in IMAGE_DIRS)
     
     if not has_images:
         print("ℹ️ Nenhuma imagem encontrada para otimizar")
         return True
     
-    print("ℹ️ Para otimizar imagens, considere usar:")
-    print("   - imagemin-cli: npm install -g imagemin-cli")
-    print("   - sharp-cli: npm install -g sharp-cli")
-    print("   - ou ferramentas online como TinyPNG")
-    
-    return True
+    from image_variants import generate_variants
+    return generate_variants(IMAGE_DIRS)
+
+def source_templates():
+    """Templates originais (sem as versões .optimized.html geradas)"""
+    templates = Path(BASE_DIR) / "templates"
+    return sorted(p for p in templates.glob("*.html") if not p.name.endswith(".optimized.html"))
+
+def optimized_template(template):
+    return template.with_name(template.stem + ".optimized.html")
 
 def create_optimized_templates():
-    """Cria versões otimizadas dos templates"""
+    """Cria versões otimizadas de todos os templates"""
     print("📄 Criando templates otimizados...")
     
-    # Ler template original
-    with open("templates/index.html", "r", encoding="utf-8") as f:
-        content = f.read()
-    
-    # Substituir referências para arquivos minificados
-    content = content.replace("style.css", "style.min.css")
-    content = content.replace("script.js", "script.min.js")
-    
-    # Salvar template otimizado
-    with open("templates/index.optimized.html", "w", encoding="utf-8") as f:
-        f.write(content)
-    
-    print("✅ Template otimizado criado: templates/index.optimized.html")
+    for template in source_templates():
+        content = template.read_text(encoding="utf-8")
+        
+        # Substituir referências para arquivos minificados
+        for original, minified in MINIFIED_ASSETS.items():
+            content = content.replace(original, minified)
+        
+        # Salvar template otimizado
+        output = optimized_template(template)
+        output.write_text(content, encoding="utf-8")
+        print(f"✅ Template otimizado criado: templates/{output.name}")
+    return True
+
+def compress_assets():
+    """Gera versões .br/.gz dos arquivos estáticos e das páginas renderizadas"""
+    print("🗜️ Comprimindo assets e páginas...")
+    from compression import main as compress_main
+    compress_main()
+    return True
+
+def warm_start_caches():
+    """Pré-compila templates e grava o snapshot do catálogo (inicialização rápida)"""
+    print("🔥 Preparando caches de inicialização...")
+    from fast_start import warm
+    warm()
     return True
 
+# ----------------------
+# Grafo de build incremental
+# ----------------------
+
+def _files(*patterns):
+    """Arquivos (caminhos relativos, ordenados) que casam com os padrões glob"""
+    base = Path(BASE_DIR)
+    return sorted({p.relative_to(base).as_posix() for pattern in patterns for p in base.glob(pattern) if p.is_file()})
+
+def _image_sources():
+    from image_variants import SOURCE_EXTENSIONS
+    return [p for d in IMAGE_DIRS for p in _files(f"{d}/*") if p.lower().endswith(SOURCE_EXTENSIONS)]
+
+def _compressible_sources():
+    from compression import is_compressible
+    return [p for p in _files("static/**/*") if is_compressible(p)] + _files("templates/*.html")
+
+class BuildStep:
+    """Etapa do build: função, etapas de que depende, entradas e saídas.
+
+    `inputs` é uma função que lista os arquivos de entrada (chamada só
+    depois das dependências terminarem, pois elas podem gerar arquivos);
+    com `inputs=None` a etapa roda sempre. `outputs` são os arquivos ou
+    pastas que precisam existir para a etapa ser considerada em dia.
+    `required=False` deixa o build seguir se a etapa falhar.
+    """
+
+    def __init__(self, name, fn, deps=(), inputs=None, outputs=(), required=True):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.inputs = inputs
+        self.outputs = tuple(outputs)
+        self.required = required
+
+BUILD_STEPS = (
+    BuildStep("npm", install_dependencies,
+              inputs=lambda: _files("package.json", "package-lock.json"), outputs=("node_modules",)),
+    BuildStep("css", build_css, deps=("npm",),
+              inputs=lambda: _files("static/css/style.css", "package.json"), outputs=("static/css/style.min.css",)),
+    BuildStep("js", build_js, deps=("npm",),
+              inputs=lambda: _files("static/js/script.js", "package.json"), outputs=("static/js/script.min.js",)),
+    BuildStep("imagens", optimize_images, required=False,
+              inputs=lambda: _image_sources() + _files("image_variants.py"),
+              outputs=tuple(f"{d}/_variants" for d in IMAGE_DIRS if os.path.isdir(os.path.join(BASE_DIR, d)))),
+    BuildStep("templates", create_optimized_templates, required=False,
+              inputs=lambda: _files("templates/*.html", "build.py"),
+              outputs=tuple(str(optimized_template(t)) for t in source_templates())),
+    BuildStep("caches", warm_start_caches, deps=("templates",), required=False,
+              inputs=lambda: _files("templates/*.html", "*.py", "questions.db"), outputs=(".cache/jinja",)),
+    # Depois de "caches": as duas etapas criam o app e não devem migrar o banco ao mesmo tempo
+    BuildStep("compressao", compress_assets, deps=("css", "js", "templates", "caches"), required=False,
+              inputs=lambda: _compressible_sources() + _files("compression.py"), outputs=(".cache/pages",)),
+)
+
+class BuildManifest:
+    """Hash das entradas de cada etapa no último build bem-sucedido.
+
+    Gravado em .cache/build_manifest.json junto com os hashes dos arquivos
+    (mtime, tamanho e hash), para que arquivos não modificados não sejam
+    lidos de novo.
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.steps = {}
+        self.fingerprints = AssetFingerprints(BASE_DIR)
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("format") == MANIFEST_FORMAT:
+            self.steps = data.get("steps", {})
+            self.fingerprints.preload(data.get("files", {}))
+
+    def inputs_hash(self, step):
+        """Hash combinado da lista de entradas da etapa e do conteúdo de cada uma"""
+        h = hashlib.sha256(step.name.encode("utf-8"))
+        for rel_path in step.inputs():
+            h.update(f"\0{rel_path}\0{self.fingerprints.digest(rel_path)}".encode("utf-8"))
+        return h.hexdigest()
+
+    def up_to_date(self, step, digest):
+        return (
+            self.steps.get(step.name) == digest
+            and all(os.path.exists(os.path.join(BASE_DIR, out)) for out in step.outputs)
+        )
+
+    def record(self, step, digest):
+        with self._lock:
+            self.steps[step.name] = digest
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"format": MANIFEST_FORMAT, "steps": self.steps, "files": self.fingerprints.export()}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+def run_build(steps=BUILD_STEPS, jobs=4, force=False):
+    """Executa as etapas em paralelo respeitando as dependências.
+
+    Etapas cujas entradas não mudaram desde o último build (e cujas saídas
+    existem) são puladas. Retorna {etapa: 'ok' | 'em dia' | 'falhou' | 'não executada'}.
+    """
+    manifest = BuildManifest()
+    status = {}
+    durations = {}
+
+    def execute(step):
+        start = time.perf_counter()
+        digest = manifest.inputs_hash(step) if step.inputs is not None else None
+        if not force and digest is not None and manifest.up_to_date(step, digest):
+            result = "em dia"
+        elif step.fn():
+            # Hash recalculado: a etapa pode ter alterado as próprias entradas
+            if step.inputs is not None:
+                manifest.record(step, manifest.inputs_hash(step))
+            result = "ok"
+        else:
+            result = "falhou"
+        durations[step.name] = time.perf_counter() - start
+        return result
+
+    pending = list(steps)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for step in list(pending):
+                dep_status = [status.get(dep) for dep in step.deps]
+                if any(s in ("falhou", "não executada") for s in dep_status):
+                    status[step.name] = "não executada"
+                    pending.remove(step)
+                elif all(s in ("ok", "em dia") for s in dep_status):
+                    running[pool.submit(execute, step)] = step
+                    pending.remove(step)
+            if not running:
+                # Dependências inexistentes ou circulares
+                for step in pending:
+                    status[step.name] = "não executada"
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    status[step.name] = future.result()
+                except Exception as e:
+                    print(f"❌ Erro na etapa {step.name}: {e}")
+                    status[step.name] = "falhou"
+
+    manifest.save()
+    print("\n⏱️ Etapas do build:")
+    for step in steps:
+        elapsed = f" ({durations[step.name]:.1f}s)" if step.name in durations else ""
+        print(f"   {step.name:<12} {status[step.name]}{elapsed}")
+    return status
+
 def generate_report():
     """Gera relatório de otimização"""
     print("\n📊 Relatório de Otimização:")
@@ -143,40 +343,34 @@ def generate_report():
     print("3. Configure cache headers para arquivos estáticos")
     print("4. Considere usar CDN para recursos externos")
 
+def _option(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
 def main():
-    """Função principal"""
+    """Função principal
+
+    Uso: python build.py [--force] [--jobs N]
+    """
+    os.chdir(BASE_DIR)
     print("🚀 Iniciando build do InteliDaily...")
     print("=" * 50)
     
-    # Verificar dependências
-    if not check_dependencies():
-        sys.exit(1)
-    
-    # Instalar dependências
-    if not install_dependencies():
-        print("❌ Falha ao instalar dependências")
-        sys.exit(1)
-    
-    # Build CSS
-    if not build_css():
-        print("❌ Falha ao otimizar CSS")
-        sys.exit(1)
+    start = time.perf_counter()
+    status = run_build(jobs=max(1, int(_option("--jobs", 4))), force="--force" in sys.argv)
     
-    # Build JS
-    if not build_js():
-        print("❌ Falha ao otimizar JavaScript")
+    failed = [step.name for step in BUILD_STEPS if step.required and status[step.name] not in ("ok", "em dia")]
+    if failed:
+        print(f"❌ Falha no build: {', '.join(failed)}")
         sys.exit(1)
     
-    # Otimizar imagens
-    optimize_images()
-    
-    # Criar templates otimizados
-    create_optimized_templates()
-    
     # Gerar relatório
     generate_report()
     
-    print("\n🎉 Build concluído com sucesso!")
+    print(f"\n🎉 Build concluído com sucesso em {time.perf_counter() - start:.1f}s!")
     print("=" * 50)
 
 if __name__ == "__main__":
@@ -0,0 +1,26 @@
+"""
+Esquema do contador de versão do catálogo de questões.
+
+Sem dependências além da biblioteca padrão, para poder ser usado por
+importadores de linha de comando sem carregar o app.
+"""
+
+# Contador de versão mantido por triggers: qualquer escrita em `questoes`
+# (app, importadores, ada.py ou edição manual) incrementa a versão.
+# Cargas em massa (universal_importer) removem os triggers durante a
+# transação e incrementam a versão uma única vez.
+CATALOG_TRIGGERS = {
+    f'questoes_catalog_{event.lower()}': (
+        f'CREATE TRIGGER IF NOT EXISTS questoes_catalog_{event.lower()} AFTER {event} ON questoes '
+        'BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END'
+    )
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+}
+
+CATALOG_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS catalog_meta (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0);
+''' + ''.join(f'    {trigger};\n' for trigger in CATALOG_TRIGGERS.values())
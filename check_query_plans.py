@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Verificador de planos de consulta.
+
+Copia o banco para uma pasta temporária, cria um histórico de simulados,
+executa as rotas da API e as consultas do ada.py capturando todo SQL
+emitido (`set_trace_callback`) e roda `EXPLAIN QUERY PLAN` em cada
+comando. Sai com erro se algum deles fizer varredura completa de uma
+tabela ("SCAN <tabela>" sem índice), para que novas consultas não
+reintroduzam scans à medida que o histórico cresce.
+
+O mesmo teste roda no pytest (tests/test_query_plans.py).
+
+Uso: python check_query_plans.py [--verbose]
+"""
+
+import importlib.util
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_FILE = 'questions.db'
+
+# Simulados criados antes da verificação (o planner escolhe índices com histórico)
+HISTORY_SIZE = 200
+
+# Tabelas de tamanho fixo e pequeno, em que o scan é intencional
+SMALL_TABLES = {'catalog_meta', 'simulado_stats', 'exam_stats', 'sqlite_master', 'sqlite_schema'}
+
+# Consultas que leem a tabela inteira por definição
+ALLOWED_SCANS = (
+    (re.compile(r'^SELECT \* FROM questoes ORDER BY id$'), 'carga do catálogo em memória'),
+)
+
+_DML = re.compile(r'^\s*(SELECT|WITH|UPDATE|DELETE|INSERT|REPLACE)\b', re.IGNORECASE)
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(.*)$')
+
+
+def _normalize(sql):
+    return ' '.join(sql.split())
+
+
+def table_scans(conn, sql):
+    """Tabelas lidas por varredura completa no plano de `sql`"""
+    scans = []
+    for row in conn.execute('EXPLAIN QUERY PLAN ' + sql):
+        match = _SCAN.match(row[3])
+        if not match:
+            continue
+        table, rest = match.groups()
+        if 'INDEX' in rest or table in SMALL_TABLES:
+            continue
+        scans.append(row[3])
+    return scans
+
+
+def _load_ada():
+    spec = importlib.util.spec_from_file_location('ada', os.path.join(BASE_DIR, 'import', 'ada.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_workload(statements):
+    """Executa as consultas de produção, registrando o SQL emitido"""
+    from app import create_app
+
+    app = create_app(DB_FILE)
+    services = app.extensions['simulados']
+    system = services.system
+    db_pool = services.db_pool
+
+    def trace(sql):
+        if _DML.match(sql):
+            statements.append(_normalize(sql))
+
+    # Conexões abertas diretamente com sqlite3.connect (ada.py) também são rastreadas
+    connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(trace)
+        return conn
+
+    fontes = [exam['id'] for exam in system.get_available_exams()]
+    for i in range(HISTORY_SIZE):
+        system.save_simulado_result(
+            fontes[i % len(fontes):][:2], 3, [1, 2, 3], '00:10:00', 1, 1, 1,
+            user_id=f'usuario_{i % 10}'
+        )
+
+    db_pool.get().set_trace_callback(trace)
+    client = app.test_client()
+    for path in ('/api/questions', '/api/questions/5', '/api/images/5', '/api/images/5/0',
+                 '/api/exams/available', '/api/exams/statistics'):
+        client.get(path)
+    client.post('/api/simulados/create', json={'selected_exams': fontes})
+    current = client.get('/api/simulados/current').get_json() or {}
+    ids = [q['id'] for q in current.get('questions', [])]
+    if ids:
+        client.get(f'/api/simulados/question/{ids[0]}')
+        client.get('/api/simulados/questions?ids=' + ','.join(map(str, ids)))
+        client.post('/api/simulados/submit', json={'answers': {str(ids[0]): 'a'}, 'skipped_questions': [1]})
+    history = client.get('/api/simulados/history').get_json() or []
+    page = client.get('/api/simulados/history?limit=5&fields=id,percentual_acerto')
+    client.get('/api/simulados/history', query_string={
+        'limit': 5, 'cursor': page.headers.get('X-Next-Cursor') or '', 'fonte': fontes[0],
+        'since': '2000-01-01', 'until': '2100-01-01',
+    })
+    if history:
+        client.get(f"/api/simulados/history/{history[0]['id']}")
+    client.get('/api/simulados/statistics')
+    client.get('/api/simulados/analytics')
+    system.get_simulados_history()
+    _, cursor = system.get_simulados_history_page(user_id='usuario_1', limit=5, fields=['id'])
+    system.get_simulados_history_page(user_id='usuario_1', limit=5, cursor=cursor, fonte=fontes[0])
+    system.get_simulado_by_id(1, user_id='usuario_1')
+    db_pool.get().set_trace_callback(None)
+
+    sqlite3.connect = traced_connect
+    try:
+        ada = _load_ada()
+        ada.get_available_databases()
+        for fonte in ada.get_available_exams(DB_FILE):
+            ada.get_questions_by_exam(DB_FILE, fonte)
+    finally:
+        sqlite3.connect = connect
+
+
+def find_table_scans(verbose=False):
+    """Roda o workload sobre DB_FILE (no diretório atual) e confere os planos.
+
+    Retorna (consultas verificadas, [(sql, scans)]) com as consultas que
+    fazem varredura completa sem estar em ALLOWED_SCANS.
+    """
+    statements = []
+    run_workload(statements)
+
+    conn = sqlite3.connect(DB_FILE)
+    failures = []
+    checked = 0
+    try:
+        for sql in dict.fromkeys(statements):
+            allowed = next((reason for pattern, reason in ALLOWED_SCANS if pattern.match(sql)), None)
+            scans = table_scans(conn, sql)
+            checked += 1
+            if verbose:
+                status = 'scan permitido' if scans and allowed else ('SCAN' if scans else 'ok')
+                print(f"[{status}] {sql}")
+            if scans and not allowed:
+                failures.append((sql, scans))
+    finally:
+        conn.close()
+    return checked, failures
+
+
+def check(verbose=False):
+    checked, failures = find_table_scans(verbose)
+    print(f"🔎 {checked} consultas verificadas")
+    for sql, scans in failures:
+        print(f"❌ {sql}\n   -> {'; '.join(scans)}")
+    if not failures:
+        print("✅ Nenhuma varredura completa de tabela")
+    return not failures
+
+
+def main():
+    verbose = '--verbose' in sys.argv
+    workdir = tempfile.mkdtemp(prefix='query_plans_')
+    try:
+        shutil.copy(os.path.join(BASE_DIR, DB_FILE), os.path.join(workdir, DB_FILE))
+        os.chdir(workdir)
+        sys.path.insert(0, BASE_DIR)
+        return check(verbose)
+    finally:
+        os.chdir(BASE_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
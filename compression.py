@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Compressão de assets e respostas (gzip e, se o pacote `brotli` estiver
+instalado, brotli).
+
+- No build (`python compression.py` ou build.py) CSS, JS e demais arquivos
+  de texto de `static/` ganham irmãos pré-comprimidos (`style.css.gz`,
+  `style.css.br`), servidos por static_assets conforme `Accept-Encoding`.
+- As páginas HTML são comprimidas uma vez por conteúdo (`PageCache`); o
+  build grava as versões comprimidas em .cache/pages/, endereçadas pelo
+  hash do HTML renderizado.
+- Respostas JSON acima de `MIN_COMPRESS_SIZE` são comprimidas na hora (as
+  listagens em cache, uma vez por versão).
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(BASE_DIR, '.cache', 'pages')
+
+# Extensões que valem a pena comprimir (imagens já vêm comprimidas)
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.html', '.svg', '.json', '.txt', '.map')
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson')
+
+# Respostas menores que isso não compensam a compressão na hora
+MIN_COMPRESS_SIZE = 1024
+
+# Codificação -> sufixo do arquivo pré-comprimido, em ordem de preferência
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings():
+    """Codificações suportadas neste processo, em ordem de preferência"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding, best=False):
+    """Comprime `data`; `best` usa o nível máximo (build e conteúdo em cache)"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+def negotiate(accept_encodings, offered):
+    """Melhor codificação de `offered` aceita pelo cliente (ou None)"""
+    best, best_quality = None, 0
+    for encoding in offered:
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(filename):
+    return filename.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+
+
+def precompressed_siblings(path):
+    """Codificações com arquivo pré-comprimido atualizado para `path`"""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return ()
+    found = []
+    for encoding, suffix in SUFFIXES.items():
+        try:
+            if os.path.getmtime(path + suffix) >= mtime:
+                found.append(encoding)
+        except OSError:
+            continue
+    return tuple(found)
+
+
+def precompress_file(path, force=False):
+    """Grava os irmãos .br/.gz de `path`; retorna quantos arquivos foram escritos.
+
+    Versões que não ficam menores que o original são removidas.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = 0
+    current = precompressed_siblings(path)
+    for encoding in available_encodings():
+        out_path = path + SUFFIXES[encoding]
+        if not force and encoding in current:
+            continue
+        compressed = compress(data, encoding, best=True)
+        if len(compressed) >= len(data):
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            continue
+        with open(out_path, 'wb') as f:
+            f.write(compressed)
+        written += 1
+    return written
+
+
+def precompress_tree(directory, force=False):
+    """Pré-comprime os arquivos de texto de `directory` (recursivo)"""
+    files = written = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            if not is_compressible(filename):
+                continue
+            files += 1
+            written += precompress_file(os.path.join(root, filename), force)
+    return files, written
+
+
+class CompressedBody:
+    """Corpo de resposta com ETag e versões comprimidas calculadas uma vez.
+
+    Com `cache_dir`, versões já gravadas (no build, por `save`) são lidas
+    do disco em vez de comprimidas de novo.
+    """
+
+    def __init__(self, body, cache_dir=None):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_dir = cache_dir
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """Corpo na codificação pedida"""
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    data = self._encoded[encoding] = self._load_or_compress(encoding)
+        return data
+
+    def _path(self, encoding):
+        return os.path.join(self.cache_dir, self.etag + SUFFIXES[encoding])
+
+    def _load_or_compress(self, encoding):
+        if self.cache_dir:
+            try:
+                with open(self._path(encoding), 'rb') as f:
+                    return f.read()
+            except OSError:
+                pass
+        return compress(self.body, encoding, best=True)
+
+    def save(self):
+        """Grava as versões comprimidas em `cache_dir`"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for encoding in available_encodings():
+            data = self.encoded(encoding)
+            with open(self._path(encoding), 'wb') as f:
+                f.write(data)
+
+
+class PageCache:
+    """Páginas renderizadas, indexadas pelo hash do HTML (endereçadas por conteúdo)"""
+
+    def __init__(self, cache_dir=PAGES_DIR):
+        self.cache_dir = cache_dir
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, body):
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        page = self._pages.get(etag)
+        if page is None:
+            with self._lock:
+                page = self._pages.setdefault(etag, CompressedBody(body, self.cache_dir))
+        return page
+
+
+def compressed_response(content, mimetype):
+    """Resposta com `content` (CompressedBody) na melhor codificação aceita.
+
+    O ETag muda com a codificação, então a revalidação (304) continua
+    funcionando para cada representação. Cache-Control e make_conditional
+    ficam com quem chama.
+    """
+    encoding = None
+    if len(content.body) >= MIN_COMPRESS_SIZE:
+        encoding = negotiate(request.accept_encodings, available_encodings())
+    response = current_app.response_class(
+        content.encoded(encoding) if encoding else content.body, mimetype=mimetype
+    )
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{content.etag}-{encoding}")
+    else:
+        response.set_etag(content.etag)
+    return response
+
+
+def prerender_pages(app, templates):
+    """Renderiza as páginas e grava as versões comprimidas em .cache/pages/"""
+    from flask import render_template
+
+    with app.test_request_context('/'):
+        for name in templates:
+            CompressedBody(render_template(name).encode('utf-8'), PAGES_DIR).save()
+    return len(templates)
+
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response, accept_encodings):
+    """Comprime respostas JSON grandes (ou em streaming) na hora"""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.is_streamed:
+        # Tamanho desconhecido: comprime em gzip à medida que os pedaços saem
+        if negotiate(accept_encodings, ('gzip',)):
+            response.response = _gzip_stream(response.response)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers.pop('Content-Length', None)
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    encoding = negotiate(accept_encodings, available_encodings())
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def main():
+    """Pré-comprime static/ e as páginas renderizadas (rodar no build)"""
+    from app import PAGE_TEMPLATES, create_app
+
+    files, written = precompress_tree(os.path.join(BASE_DIR, 'static'))
+    print(f"🗜️ {files} arquivos verificados, {written} versões comprimidas geradas ({', '.join(available_encodings())})")
+    pages = prerender_pages(create_app(), PAGE_TEMPLATES)
+    print(f"🗜️ {pages} páginas renderizadas e comprimidas em {os.path.relpath(PAGES_DIR, BASE_DIR)}/")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import contextvars
+import functools
+import os
+import sys
+
+# Threads reais disponíveis para o trabalho bloqueante (sqlite3) por worker
+DB_WORKERS = int(os.environ.get('DB_WORKERS', '8'))
+
+
+def gevent_patched():
+    """True se o processo roda com o monkey patching do gevent (gunicorn -k gevent)"""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+class BlockingExecutor:
+    """Executa views com I/O bloqueante em um pool limitado de threads reais.
+
+    Em workers gevent cada requisição é um greenlet, e uma chamada ao
+    sqlite3 bloqueia o hub e, com ele, todas as conexões do worker. Aqui a
+    view roda em uma thread do threadpool do gevent (no máximo
+    `max_workers` ao mesmo tempo, cada uma com sua conexão do pool) enquanto
+    o greenlet da requisição espera sem travar os demais. Com workers
+    síncronos ou com threads (gunicorn sync/gthread, servidor de
+    desenvolvimento, adaptador ASGI) a chamada é direta.
+    """
+
+    def __init__(self, max_workers=DB_WORKERS):
+        self.max_workers = max_workers
+        self._pool = None
+        if gevent_patched():
+            from gevent.threadpool import ThreadPool
+            self._pool = ThreadPool(max_workers)
+
+    @property
+    def offloading(self):
+        return self._pool is not None
+
+    def run(self, fn, *args, **kwargs):
+        if self._pool is None:
+            return fn(*args, **kwargs)
+        # O contexto do greenlet (request e sessão do Flask) acompanha a chamada
+        context = contextvars.copy_context()
+        return self._pool.spawn(context.run, fn, *args, **kwargs).get()
+
+    def wrap(self, view):
+        """View que roda em `run` (mantém nome e docstring da original)"""
+        @functools.wraps(view)
+        def offloaded(*args, **kwargs):
+            return self.run(view, *args, **kwargs)
+        return offloaded
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from metrics import InstrumentedConnection
+
+DB_PATH = 'questions.db'
+
+# PRAGMAs aplicados uma única vez, quando a conexão é aberta
+CONNECTION_PRAGMAS = (
+    ('synchronous', 'NORMAL'),      # seguro com WAL e bem mais barato que FULL
+    ('cache_size', -16000),         # ~16 MB de page cache por conexão
+    ('mmap_size', 64 * 1024 * 1024),  # 64 MB mapeados em memória
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),         # espera até 5s por locks de escrita
+)
+
+# Quantidade de statements preparados mantidos em cache por conexão
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionPool:
+    """Pool de conexões SQLite com uma conexão por thread (e por processo).
+
+    Cada thread recebe sempre a mesma conexão, já configurada com WAL e
+    PRAGMAs ajustados; o cache de statements do sqlite3 reaproveita os
+    statements preparados entre requisições. As conexões contam e medem
+    cada consulta (metrics, exposto em /metrics). Após um fork (ex.: workers do
+    gunicorn) as conexões herdadas são descartadas e reabertas.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wal_ready = False
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+            factory=InstrumentedConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        self._ensure_wal(conn)
+        for name, value in CONNECTION_PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _ensure_wal(self, conn):
+        """Ativa o modo WAL (persistente no arquivo) uma vez por processo"""
+        if self._wal_ready:
+            return
+        with self._lock:
+            if not self._wal_ready:
+                try:
+                    conn.execute('PRAGMA journal_mode = WAL')
+                except sqlite3.OperationalError as e:
+                    # Banco bloqueado por outro processo: segue no modo atual
+                    print(f"⚠️  Não foi possível ativar WAL: {e}")
+                self._wal_ready = True
+
+    def get(self):
+        """Retorna a conexão da thread atual, abrindo-a se necessário"""
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is None or local.pid != os.getpid():
+            conn = self._open()
+            local.conn = conn
+            local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Empresta a conexão da thread, com commit/rollback ao final.
+
+        A conexão não é fechada ao sair do bloco; ela continua disponível
+        para a próxima requisição atendida pela mesma thread.
+        """
+        conn = self.get()
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        else:
+            if conn.in_transaction:
+                conn.commit()
+
+    def close(self):
+        """Fecha a conexão da thread atual (ex.: ao encerrar um worker)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    """Retorna o pool compartilhado para o banco informado"""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(db_path)
+    return pool
@@ -0,0 +1,70 @@
+import bisect
+import random
+
+# Estrutura fixa dos blocos conforme especificação
+BLOCK_STRUCTURE = {
+    'bloco_1': 8,   # 8 questões
+    'bloco_2': 6,   # 6 questões
+    'bloco_3': 6,   # 6 questões
+    'bloco_4': 4    # 4 questões
+}
+
+
+def assign_block(question_index, block_structure=BLOCK_STRUCTURE):
+    """Atribui cada questão ao bloco correto baseado no índice (0-based)"""
+    limit = 0
+    block_num = 0
+    for block_num, block_size in enumerate(block_structure.values(), 1):
+        limit += block_size
+        if question_index < limit:
+            return block_num
+    # Questões além da estrutura ficam no último bloco
+    return block_num
+
+
+def sample_from_pools(pools, k, rng=random):
+    """Sorteia k ids distintos de várias listas sem concatená-las.
+
+    Sorteia k posições em `range(total)` (custo O(k)) e localiza cada
+    posição na lista correspondente via busca binária nos tamanhos
+    acumulados, então o custo não cresce com o tamanho das provas. Se as
+    listas tiverem menos de k ids, todos são devolvidos (em ordem aleatória).
+    """
+    bounds = []
+    total = 0
+    for pool in pools:
+        total += len(pool)
+        bounds.append(total)
+    k = min(k, total)
+
+    picked = []
+    for position in rng.sample(range(total), k):
+        pool_index = bisect.bisect_right(bounds, position)
+        offset = position - (bounds[pool_index - 1] if pool_index else 0)
+        picked.append(pools[pool_index][offset])
+    return picked
+
+
+def sample_exam(catalog, selected_exams, num_questions=24, exam_distribution=None, rng=random):
+    """Sorteia as questões de um simulado a partir do catálogo em memória.
+
+    Trabalha apenas com os ids válidos pré-calculados por prova e preenche a
+    estrutura de blocos em uma única passada. Retorna uma lista de tuplas
+    (id, bloco); se não houver questões suficientes, a lista vem com todas
+    as disponíveis (quem chama decide se o total basta).
+    """
+    if exam_distribution:
+        # Modo personalizado: amostra independente por prova, na ordem informada
+        ids = []
+        for exam_id, count in exam_distribution.items():
+            if count <= 0:
+                continue
+            pool = catalog.valid_ids_for(exam_id)
+            ids.extend(rng.sample(pool, min(count, len(pool))))
+        ids = ids[:num_questions]
+    else:
+        # Modo aleatório: amostra única sobre a união das provas selecionadas
+        pools = [catalog.valid_ids_for(exam_id) for exam_id in dict.fromkeys(selected_exams)]
+        ids = sample_from_pools(pools, num_questions, rng)
+
+    return [(qid, assign_block(index)) for index, qid in enumerate(ids)]
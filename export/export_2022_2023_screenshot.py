@@ -1,57 +1,55 @@
 import fitz
 import re
-import os
+
+from export_engine import analyze_pages, render_to_webp
 
 PDF_PATH = "Provas-Inteli.pdf"
+QUESTION_PATTERN = r'QUESTÃO\s+\d+\s*\|'
 
-def find_question_blocks_by_text(pdf_path):
+def find_question_blocks_by_text(pdf_path, workers=None):
     """Localiza blocos de enunciado no PDF usando 'QUESTÃO XX |' até antes das alternativas"""
-    doc = fitz.open(pdf_path)
+    # Texto, blocos e posições de cada 'QUESTÃO XX |' saem de uma única passada por página
+    pages = analyze_pages(pdf_path, search_patterns=[QUESTION_PATTERN], workers=workers)
     question_parts = []
 
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        text = page.get_text("text")
-        matches = list(re.finditer(r'QUESTÃO\s+\d+\s*\|', text))
+    for page in pages:
+        matches = list(re.finditer(QUESTION_PATTERN, page.text))
+        if not matches:
+            continue
+
+        # cortar no início das alternativas (A) ) — igual para toda a página
+        y_alternatives = page.rect.y1
+        for block in page.blocks:
+            btext = block[4]
+            if re.match(r'^\s*A[\)\.]', btext):
+                y_alternatives = min(y_alternatives, block[1] - 5)
+                break
+
         for match in matches:
             # pegar a posição da questão no texto
-            quads = page.search_for(match.group())
+            quads = page.search(match.group())
             if not quads:
                 continue
             y_start = quads[0].y0  # início do enunciado
-            y_end = page.rect.y1
-
-            # cortar no início das alternativas (A) )
-            blocks = page.get_text("blocks")
-            for block in blocks:
-                btext = block[4]
-                if re.match(r'^\s*A[\)\.]', btext):
-                    y_end = min(y_end, block[1] - 5)
-                    break
+            y_end = y_alternatives
 
             rect = fitz.Rect(page.rect.x0 + 20, y_start, page.rect.x1 - 20, y_end)
-            question_parts.append([{'page': page_num, 'rect': rect}])
+            question_parts.append([{'page': page.page, 'rect': rect}])
 
-    doc.close()
     return question_parts
 
 
-def capture_2022_2023_questions_imgs(pdf_path, question_parts, output_dir="2022_2023_questions_imgs"):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    doc = fitz.open(pdf_path)
-    for idx, parts in enumerate(question_parts, 1):
-        # apenas um arquivo por questão
-        part = parts[0]
-        page = doc[part['page']]
-        pix = page.get_pixmap(clip=part['rect'])
-        filename = f"questao_{idx}.png"
-        path = os.path.join(output_dir, filename)
-        pix.save(path)
-    doc.close()
+def capture_2022_2023_questions_imgs(pdf_path, question_parts, output_dir="2022_2023_questions_imgs", workers=None):
+    # apenas um arquivo por questão, renderizado direto em WebP
+    jobs = [
+        (parts[0]['page'], parts[0]['rect'], f"questao_{idx}.webp")
+        for idx, parts in enumerate(question_parts, 1)
+    ]
+    for filename, error in render_to_webp(pdf_path, jobs, output_dir, workers=workers):
+        if error:
+            print(f"❌ Erro em {filename}: {error}")
 
 
 if __name__ == "__main__":
     question_parts = find_question_blocks_by_text(PDF_PATH)
-    capture_2022_2023_questions_imgs(PDF_PATH, question_parts)
\ No newline at end of file
+    capture_2022_2023_questions_imgs(PDF_PATH, question_parts)
@@ -1,25 +1,25 @@
 import fitz
 import re
-import os
+
+from export_engine import analyze_pages, render_to_webp
 
 PDF_FILE = "Processo-Seletivo-2024.1.pdf"
 OUTPUT_DIR = "2024_questions_imgs"
+HEADER_TEXT = "Processo de Admissão 2024.1 – Instituto de Tecnologia e Liderança"
 
-def find_question_blocks(pdf_path):
-    doc = fitz.open(pdf_path)
+def find_question_blocks(pdf_path, workers=None):
+    # Texto, blocos e cabeçalhos de cada página são extraídos uma única vez, em paralelo
+    pages = analyze_pages(pdf_path, search_texts=[HEADER_TEXT], workers=workers)
     question_parts = []
-    header_text = "Processo de Admissão 2024.1 – Instituto de Tecnologia e Liderança"
     all_headers = []
 
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        header_rects = page.search_for(header_text)
+    for info in pages:
+        header_rects = info.search(HEADER_TEXT)
         if header_rects:
             header_rect = sorted(header_rects, key=lambda r: r.y0)[0]
-            all_headers.append({'page': page_num, 'rect': header_rect})
+            all_headers.append({'page': info.page, 'rect': header_rect})
 
     if len(all_headers) < 2:
-        doc.close()
         return []
 
     for i in range(1, len(all_headers)):
@@ -28,16 +28,15 @@ def find_question_blocks(pdf_path):
 
         parts = []
         current_page_num = current['page']
-        next_page_num = next_h['page'] if next_h else len(doc) - 1
+        next_page_num = next_h['page'] if next_h else len(pages) - 1
 
         for p in range(current_page_num, next_page_num + 1):
-            page = doc[p]
+            page = pages[p]
             y_start = current['rect'].y1 + 10 if p == current_page_num else page.rect.y0 + 20
             y_end = page.rect.y1 - 20
 
             if p == next_page_num:
-                text_blocks = page.get_text("blocks")
-                for block in sorted(text_blocks, key=lambda b: b[1]):
+                for block in sorted(page.blocks, key=lambda b: b[1]):
                     text = block[4]
                     y0 = block[1]
                     if y0 < y_start:
@@ -56,29 +55,20 @@ def find_question_blocks(pdf_path):
         if parts:
             question_parts.append(parts)
 
-    doc.close()
     return question_parts
 
-def capture_question_images(pdf_path, question_parts, output_dir):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    doc = fitz.open(pdf_path)
-    for q_num, q_parts in enumerate(question_parts, 1):
-        rects = [part['rect'] for part in q_parts]
-        pages = [part['page'] for part in q_parts]
-        combined_pixmaps = []
-        for page_num, rect in zip(pages, rects):
-            page = doc.load_page(page_num)
-            combined_pixmaps.append(page.get_pixmap(clip=rect, dpi=300))
-        if combined_pixmaps:
-            pix = combined_pixmaps[0]
-            filename = f"questao_{q_num}.png"
-            path = os.path.join(output_dir, filename)
-            pix.save(path)
-    doc.close()
+def capture_question_images(pdf_path, question_parts, output_dir, workers=None):
+    # Apenas o primeiro trecho de cada questão vira imagem (renderizada direto em WebP)
+    jobs = [
+        (q_parts[0]['page'], q_parts[0]['rect'], f"questao_{q_num}.webp")
+        for q_num, q_parts in enumerate(question_parts, 1)
+        if q_parts
+    ]
+    for filename, error in render_to_webp(pdf_path, jobs, output_dir, dpi=300, workers=workers):
+        if error:
+            print(f"❌ Erro em {filename}: {error}")
 
 if __name__ == "__main__":
     question_parts = find_question_blocks(PDF_FILE)
     if question_parts:
-        capture_question_images(PDF_FILE, question_parts, OUTPUT_DIR)
\ No newline at end of file
+        capture_question_images(PDF_FILE, question_parts, OUTPUT_DIR)
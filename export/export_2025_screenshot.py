@@ -1,15 +1,14 @@
-import fitz  # PyMuPDF
 import os
 import sys
 
-def capture_all_pages(pdf_path, output_dir="2025_questions_imgs"):
+from export_engine import page_count, render_to_webp
+
+def capture_all_pages(pdf_path, output_dir="2025_questions_imgs", workers=None):
     """
-    Captura screenshot de todas as páginas do PDF
+    Captura screenshot de todas as páginas do PDF (em paralelo, direto em WebP)
     """
     try:
-        # Abre o PDF
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
+        total_pages = page_count(pdf_path)
         
         print(f"📄 PDF aberto: {pdf_path}")
         print(f"📊 Total de páginas: {total_pages}")
@@ -19,30 +18,18 @@ def capture_all_pages(pdf_path, output_dir="2025_questions_imgs"):
             os.makedirs(output_dir)
             print(f"📁 Pasta criada: {output_dir}")
         
-        # Processa cada página
-        for page_num in range(total_pages):
-            try:
-                # Carrega a página
-                page = doc.load_page(page_num)
-                
-                # Captura screenshot em alta resolução
-                pix = page.get_pixmap(dpi=300)
-                
-                # Nome do arquivo
-                filename = f"questao_{page_num + 1:03d}.png"
-                filepath = os.path.join(output_dir, filename)
-                
-                # Salva a imagem
-                pix.save(filepath)
-                
-                print(f"✅ Página {page_num + 1:3d}/{total_pages}: {filename}")
-                
-            except Exception as e:
-                print(f"❌ Erro na página {page_num + 1}: {e}")
-                continue
+        # Uma captura em alta resolução por página, dividida entre os workers
+        jobs = [
+            (page_num, None, f"questao_{page_num + 1:03d}.webp")
+            for page_num in range(total_pages)
+        ]
+        results = render_to_webp(pdf_path, jobs, output_dir, dpi=300, workers=workers)
         
-        # Fecha o documento
-        doc.close()
+        for page_num, (filename, error) in enumerate(results, 1):
+            if error:
+                print(f"❌ Erro na {error}")
+            else:
+                print(f"✅ Página {page_num:3d}/{total_pages}: {filename}")
         
         print(f"\n🎉 Processamento concluído!")
         print(f"📁 Imagens salvas em: {output_dir}")
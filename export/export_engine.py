@@ -0,0 +1,168 @@
+"""
+Motor compartilhado dos scripts de exportação de PDFs.
+
+Divide as páginas entre um pool de processos (cada worker abre o PDF uma
+única vez), extrai texto e blocos de cada página uma só vez e grava os
+recortes direto em WebP, sem PNGs intermediários.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+WEBP_QUALITY = 85
+
+# Documento aberto em cada processo do pool (um por worker)
+_doc = None
+
+
+def _init_worker(pdf_path):
+    global _doc
+    _doc = fitz.open(pdf_path)
+
+
+def default_workers():
+    """Quantidade de processos padrão (um por CPU)"""
+    return max(1, os.cpu_count() or 1)
+
+
+def split_ranges(items, parts):
+    """Divide `items` em até `parts` fatias contíguas de tamanho parecido"""
+    items = list(items)
+    parts = max(1, min(parts, len(items)))
+    size, extra = divmod(len(items), parts)
+    chunks = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return [chunk for chunk in chunks if chunk]
+
+
+def page_count(pdf_path):
+    """Total de páginas do PDF"""
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def _run(pdf_path, func, chunks, workers):
+    """Executa `func(chunk)` em cada fatia no pool, preservando a ordem"""
+    if workers <= 1 or len(chunks) <= 1:
+        _init_worker(pdf_path)
+        try:
+            return [func(chunk) for chunk in chunks]
+        finally:
+            _doc.close()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)) as pool:
+        return list(pool.map(func, chunks))
+
+
+# ----------------------
+# Análise de páginas
+# ----------------------
+
+class PageInfo:
+    """Texto, blocos e buscas de uma página, extraídos uma única vez"""
+
+    __slots__ = ('page', 'rect', 'text', 'blocks', 'hits')
+
+    def __init__(self, page, rect, text, blocks, hits):
+        self.page = page
+        self.rect = fitz.Rect(rect)
+        self.text = text
+        self.blocks = blocks
+        self.hits = hits
+
+    def search(self, needle):
+        """Retângulos de `needle` na página (buscados no worker)"""
+        return [fitz.Rect(r) for r in self.hits.get(needle, ())]
+
+
+def _analyze_chunk(args):
+    page_numbers, search_texts, search_patterns = args
+    results = []
+    for page_num in page_numbers:
+        page = _doc.load_page(page_num)
+        text = page.get_text("text")
+        blocks = [tuple(block) for block in page.get_text("blocks")]
+        needles = set(search_texts)
+        for pattern in search_patterns:
+            needles.update(match.group() for match in re.finditer(pattern, text))
+        hits = {needle: [tuple(r) for r in page.search_for(needle)] for needle in needles}
+        results.append((page_num, tuple(page.rect), text, blocks, hits))
+    return results
+
+
+def analyze_pages(pdf_path, search_texts=(), search_patterns=(), workers=None):
+    """Extrai texto, blocos e posições de busca de todas as páginas em paralelo.
+
+    `search_texts` são procurados em todas as páginas; para cada regex de
+    `search_patterns`, cada trecho distinto encontrado no texto da página é
+    procurado uma única vez. Retorna uma lista de `PageInfo` na ordem das
+    páginas.
+    """
+    workers = workers or default_workers()
+    total = page_count(pdf_path)
+    chunks = [
+        (chunk, tuple(search_texts), tuple(search_patterns))
+        for chunk in split_ranges(range(total), workers)
+    ]
+    pages = []
+    for result in _run(pdf_path, _analyze_chunk, chunks, workers):
+        pages.extend(PageInfo(*item) for item in result)
+    return pages
+
+
+# ----------------------
+# Renderização
+# ----------------------
+
+def _save_webp(pix, path, quality):
+    mode = "RGBA" if pix.alpha else "RGB"
+    image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    image.save(path, format="WEBP", quality=quality, method=6)
+
+
+def _render_chunk(args):
+    jobs, output_dir, dpi, quality = args
+    results = []
+    for page_num, clip, filename in jobs:
+        try:
+            page = _doc.load_page(page_num)
+            options = {'alpha': False}
+            if clip is not None:
+                options['clip'] = fitz.Rect(clip)
+            if dpi:
+                options['dpi'] = dpi
+            pix = page.get_pixmap(**options)
+            _save_webp(pix, os.path.join(output_dir, filename), quality)
+            results.append((filename, None))
+        except Exception as e:
+            results.append((filename, f"página {page_num + 1}: {e}"))
+    return results
+
+
+def render_to_webp(pdf_path, jobs, output_dir, dpi=None, quality=WEBP_QUALITY, workers=None):
+    """Renderiza recortes de páginas direto em WebP usando o pool de processos.
+
+    `jobs` é uma lista de (página, retângulo ou None para a página inteira,
+    nome do arquivo). Os jobs são ordenados por página e divididos em fatias
+    contíguas, então cada worker percorre um trecho do PDF. Retorna a lista
+    de (arquivo, erro ou None) na ordem dos jobs recebidos.
+    """
+    workers = workers or default_workers()
+    os.makedirs(output_dir, exist_ok=True)
+    normalized = [
+        (page_num, tuple(clip) if clip is not None else None, filename)
+        for page_num, clip, filename in jobs
+    ]
+    ordered = sorted(normalized, key=lambda job: job[0])
+    chunks = [(chunk, output_dir, dpi, quality) for chunk in split_ranges(ordered, workers * 4)]
+    status = {}
+    for result in _run(pdf_path, _render_chunk, chunks, workers):
+        status.update(result)
+    return [(filename, status.get(filename)) for _, _, filename in normalized]
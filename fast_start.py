@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Inicialização rápida (cold start) e medição do tempo de inicialização.
+
+No plano gratuito do onRender o processo é encerrado após um período sem
+acessos e a primeira requisição espera o Python subir, o app ser criado e
+o dashboard ser compilado. No modo de inicialização rápida (padrão;
+FAST_START=0 desliga):
+
+- os templates Jinja são compilados para um cache de bytecode em disco;
+- o catálogo de questões é montado a partir de um snapshot compacto
+  (question_catalog) enquanto o conteúdo de `questoes` não mudar.
+
+`python fast_start.py --warm` prepara os caches (e o bytecode dos módulos
+Python) e deve rodar no build. `python fast_start.py` mede o tempo de
+importação por módulo (-X importtime), as etapas de criação do app e o
+tempo do início do processo até o primeiro byte de GET /, sem e com os
+caches, e registra o resultado em .cache/startup_history.jsonl.
+
+Uso: python fast_start.py [--warm] [--runs N] [--top N]
+"""
+
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, '.cache')
+JINJA_CACHE_DIR = os.path.join(CACHE_DIR, 'jinja')
+HISTORY_FILE = os.path.join(CACHE_DIR, 'startup_history.jsonl')
+
+# Linha com as etapas medidas pelo processo servidor (--serve)
+_PHASES_PREFIX = 'STARTUP '
+
+
+def enabled():
+    """Modo de inicialização rápida ligado (FAST_START=0 desliga)"""
+    return os.environ.get('FAST_START', '1') != '0'
+
+
+def catalog_snapshot_path(db_path):
+    """Arquivo de snapshot do catálogo, ao lado do banco: .cache/<banco>.catalog"""
+    directory, name = os.path.split(os.path.abspath(db_path))
+    return os.path.join(directory, '.cache', name + '.catalog')
+
+
+def configure(app):
+    """Usa o cache de bytecode em disco para os templates do app"""
+    from jinja2 import FileSystemBytecodeCache
+
+    try:
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"⚠️  Cache de templates desativado: {e}")
+        return
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
+
+def precompile_templates(app):
+    """Compila todos os templates para o cache de bytecode; retorna quantos"""
+    compiled = 0
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+            compiled += 1
+        except Exception as e:
+            print(f"⚠️  Template {name} não compilado: {e}")
+    return compiled
+
+
+def warm():
+    """Prepara os caches de inicialização (rodar no build)"""
+    import compileall
+
+    from app import create_app
+
+    compileall.compile_dir(BASE_DIR, maxlevels=0, quiet=1)
+    app = create_app()
+    templates = precompile_templates(app)
+    saved = app.extensions['simulados'].catalog.save_snapshot()
+    print(f"🔥 {templates} templates pré-compilados; snapshot do catálogo {'gravado' if saved else 'não gravado'}")
+
+
+def clear_caches(db_path='questions.db'):
+    """Remove os caches de inicialização (para medir a partida sem eles)"""
+    import shutil
+
+    shutil.rmtree(JINJA_CACHE_DIR, ignore_errors=True)
+    try:
+        os.remove(catalog_snapshot_path(os.path.join(BASE_DIR, db_path)))
+    except OSError:
+        pass
+
+
+# ----------------------
+# Medição
+# ----------------------
+
+def import_times(module='wsgi'):
+    """[(módulo, próprio_ms, acumulado_ms)] da importação de `module` em um processo novo"""
+    import subprocess
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(own) / 1000, int(cumulative) / 1000))
+    return rows
+
+
+def _serve(port):
+    """Processo medido: importa, cria o app e serve até ser encerrado"""
+    start = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter()
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    print(_PHASES_PREFIX + json.dumps({
+        'import_ms': round((imported - start) * 1000, 1),
+        'create_app_ms': round((created - imported) * 1000, 1),
+    }), flush=True)
+    server.serve_forever()
+
+
+def _free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_byte(path='/', timeout=60):
+    """Do início do processo ao primeiro byte de `path`: (ms, etapas do servidor)"""
+    import http.client
+    import subprocess
+
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', str(port)],
+        cwd=BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError('o servidor encerrou antes de responder')
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f'sem resposta em {timeout}s')
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read(1)
+                elapsed = time.perf_counter() - start
+                response.read()
+                break
+            except OSError:
+                time.sleep(0.005)
+            finally:
+                conn.close()
+        phases = {}
+        for line in proc.stdout:
+            if line.startswith(_PHASES_PREFIX):
+                phases = json.loads(line[len(_PHASES_PREFIX):])
+                break
+        return round(elapsed * 1000, 1), phases
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def profile(runs=3, top=15):
+    """Relatório de inicialização; retorna o registro gravado no histórico"""
+    print("⏱️  Importação (processo novo, python -X importtime -c 'import wsgi'):")
+    rows = import_times()
+    for name, own, cumulative in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"   {own:8.1f} ms próprio  {cumulative:8.1f} ms acumulado  {name}")
+    project = [r for r in rows if os.path.exists(os.path.join(BASE_DIR, r[0].split('.')[0] + '.py'))]
+    print("   Módulos do projeto (acumulado):")
+    for name, own, cumulative in sorted(project, key=lambda r: r[2], reverse=True):
+        print(f"   {cumulative:8.1f} ms  {name}")
+
+    cold = []
+    for _ in range(runs):
+        clear_caches()
+        cold.append(time_to_first_byte()[0])
+    warm_runs = [time_to_first_byte() for _ in range(runs)]
+    warm_ms = _median([ms for ms, _ in warm_runs])
+    phases = warm_runs[-1][1]
+
+    record = {
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'primeiro_byte_sem_cache_ms': _median(cold),
+        'primeiro_byte_ms': warm_ms,
+        'import_ms': phases.get('import_ms'),
+        'create_app_ms': phases.get('create_app_ms'),
+    }
+    print(f"🚀 Início do processo até o primeiro byte de GET / (mediana de {runs}):")
+    print(f"   sem caches: {record['primeiro_byte_sem_cache_ms']:.1f} ms")
+    print(f"   com caches: {record['primeiro_byte_ms']:.1f} ms "
+          f"(importação {record['import_ms']} ms, create_app {record['create_app_ms']} ms)")
+
+    previous = None
+    if os.path.exists(HISTORY_FILE):
+        with open(HISTORY_FILE, encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()]
+        if lines:
+            previous = json.loads(lines[-1])
+    if previous and previous.get('primeiro_byte_ms'):
+        delta = record['primeiro_byte_ms'] - previous['primeiro_byte_ms']
+        print(f"   medição anterior ({previous['data']}): {previous['primeiro_byte_ms']:.1f} ms ({delta:+.1f} ms)")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return record
+
+
+def _option(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+
+def main():
+    if '--serve' in sys.argv:
+        _serve(int(_option('--serve', 0)))
+    elif '--warm' in sys.argv:
+        warm()
+    else:
+        profile(runs=max(1, int(_option('--runs', 3))), top=int(_option('--top', 15)))
+
+
+if __name__ == '__main__':
+    main()
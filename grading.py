@@ -0,0 +1,102 @@
+"""
+Correção de simulados.
+
+`grade` corrige as respostas de um simulado em uma única passada: monta uma
+vez o mapa de respostas por id e o conjunto de questões puladas e percorre
+as questões calculando acertos, erros, acertos por bloco e o detalhamento
+por questão. É usado na submissão do simulado e serve para recorrigir
+resultados gravados quando um gabarito é corrigido.
+
+Uso (micro-benchmark): python grading.py
+"""
+
+from simulado_results import NUM_BLOCKS
+
+
+def _normalize(value):
+    return (value or '').lower()
+
+
+def grade(questions, answers, skipped=()):
+    """Corrige um simulado.
+
+    `questions` é a lista ordenada de questões ({id, gabarito, bloco}),
+    `answers` mapeia id da questão (int ou str) para a alternativa marcada
+    e `skipped` contém as posições (base 0) das questões puladas. Respostas
+    para ids que não estão no simulado contam como erradas.
+    """
+    answers = {str(qid): ans for qid, ans in (answers or {}).items()}
+    skipped = set(skipped or ())
+
+    correct = 0
+    accuracies = [0] * NUM_BLOCKS
+    details = []
+    for i, q in enumerate(questions):
+        key = str(q['id'])
+        answer = answers.get(key)
+        is_correct = _normalize(answer) == _normalize(q['gabarito'])
+        if is_correct and key in answers:
+            correct += 1
+        bloco = q.get('bloco', 1)
+        if is_correct and isinstance(bloco, int) and 1 <= bloco <= NUM_BLOCKS:
+            accuracies[bloco - 1] += 1
+        details.append({
+            'id': q['id'],
+            'bloco': bloco,
+            'numero': i + 1,
+            'gabarito': q['gabarito'],
+            'resposta': answer or None,
+            'correta': is_correct,
+            'pulada': i in skipped
+        })
+
+    return {
+        'correct': correct,
+        'wrong': len(answers) - correct,
+        'skipped': len(skipped),
+        'details': {'questions': details, 'accuracies': accuracies}
+    }
+
+
+def _linear_grade(questions, answers, skipped):
+    """Correção anterior (busca linear por resposta), usada só no benchmark"""
+    correct = wrong = 0
+    for qid, ans in answers.items():
+        q = next((q for q in questions if str(q['id']) == str(qid)), None)
+        if q and (ans or '').lower() == (q['gabarito'] or '').lower():
+            correct += 1
+        else:
+            wrong += 1
+    details = []
+    for i, q in enumerate(questions):
+        answer = answers.get(str(q['id'])) or answers.get(q['id'])
+        details.append({'correta': (answer or '').lower() == (q['gabarito'] or '').lower(), 'pulada': i in skipped})
+    return correct, wrong, details
+
+
+def benchmark(sizes=(24, 100, 1000), repeat=5):
+    """Compara a correção em uma passada com a busca linear"""
+    import random
+    import timeit
+
+    rng = random.Random(42)
+    for size in sizes:
+        questions = [
+            {'id': 1000 + i, 'gabarito': rng.choice('abcde'), 'bloco': i % NUM_BLOCKS + 1}
+            for i in range(size)
+        ]
+        answers = {str(q['id']): rng.choice('abcde') for q in questions if rng.random() < 0.9}
+        skipped = [i for i in range(size) if str(questions[i]['id']) not in answers]
+
+        result = grade(questions, answers, skipped)
+        correct, wrong, _ = _linear_grade(questions, answers, skipped)
+        assert (result['correct'], result['wrong']) == (correct, wrong)
+
+        number = max(1, 20000 // size)
+        new = min(timeit.repeat(lambda: grade(questions, answers, skipped), number=number, repeat=repeat)) / number
+        old = min(timeit.repeat(lambda: _linear_grade(questions, answers, skipped), number=number, repeat=repeat)) / number
+        print(f"📏 {size:>5} questões: {new * 1e6:10.1f} µs (linear: {old * 1e6:10.1f} µs, {old / new:6.1f}x)")
+
+
+if __name__ == '__main__':
+    benchmark()
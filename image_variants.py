@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Gerador offline de variantes responsivas das imagens das questões.
+
+Para cada imagem em *_questions_imgs gera, com Pillow, versões em algumas
+larguras e dois níveis de qualidade (WebP sempre; AVIF quando o Pillow
+instalado suporta). As variantes ficam em <pasta>/_variants/ e são
+escolhidas pela rota /img/ conforme `Accept`, dicas de largura e Save-Data.
+"""
+
+import os
+import sys
+from io import BytesIO
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMG_DIRS = ('2022_questions_imgs', '2023_questions_imgs', '2024_questions_imgs', '2025_questions_imgs')
+VARIANTS_DIR = '_variants'
+# Marcador de variante descartada por não ficar menor que o original
+SKIP_SUFFIX = '.skip'
+SOURCE_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg')
+
+# Larguras geradas (px); originais mais estreitos não são ampliados
+WIDTHS = (480, 960, 1440)
+# Níveis de qualidade: 'low' é usado com Save-Data ou ?q=low
+QUALITY_TIERS = {'high': 82, 'low': 55}
+# Formatos em ordem de preferência (mime, extensão, formato Pillow)
+FORMATS = (
+    ('image/avif', '.avif', 'AVIF'),
+    ('image/webp', '.webp', 'WEBP'),
+)
+
+
+def _pil_image():
+    """Módulo PIL.Image ou None; importado só na geração (fora do caminho de inicialização do app)"""
+    try:
+        from PIL import Image
+    except Exception:
+        return None
+    return Image
+
+
+def supported_formats():
+    """Formatos de saída suportados pelo Pillow instalado"""
+    Image = _pil_image()
+    if Image is None:
+        return ()
+    Image.init()
+    return tuple(fmt for fmt in FORMATS if fmt[2] in Image.SAVE)
+
+
+def variant_name(stem, width, tier, ext):
+    """Nome do arquivo de variante: questao_1.960w.high.webp"""
+    return f"{stem}.{width}w.{tier}{ext}"
+
+
+def variant_path(rel_path, width, tier, ext):
+    """Caminho (relativo à raiz) da variante de uma imagem"""
+    directory, filename = os.path.split(rel_path)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, VARIANTS_DIR, variant_name(stem, width, tier, ext)).replace('\\', '/')
+
+
+def _up_to_date(out_path, src_mtime):
+    for path in (out_path, out_path + SKIP_SUFFIX):
+        if os.path.exists(path) and os.path.getmtime(path) >= src_mtime:
+            return True
+    return False
+
+
+def generate_for_image(src_path, out_dir, formats, force=False):
+    """Gera as variantes de uma imagem; retorna quantos arquivos foram escritos.
+
+    Variantes que não ficam menores que o arquivo original são descartadas
+    (fica só um marcador .skip) e a rota /img/ cai na próxima opção.
+    """
+    stem = os.path.splitext(os.path.basename(src_path))[0]
+    src_mtime = os.path.getmtime(src_path)
+    src_size = os.path.getsize(src_path)
+    written = 0
+    Image = _pil_image()
+    with Image.open(src_path) as im:
+        im = im.convert('RGBA') if im.mode in ('P', 'LA', 'RGBA') else im.convert('RGB')
+        for width in WIDTHS:
+            if width >= im.width:
+                continue
+            height = max(1, round(im.height * width / im.width))
+            resized = None
+            for tier, quality in QUALITY_TIERS.items():
+                for _, ext, pil_format in formats:
+                    out_path = os.path.join(out_dir, variant_name(stem, width, tier, ext))
+                    if not force and _up_to_date(out_path, src_mtime):
+                        continue
+                    if resized is None:
+                        resized = im.resize((width, height), Image.LANCZOS)
+                    options = {'method': 6} if pil_format == 'WEBP' else {}
+                    buffer = BytesIO()
+                    resized.save(buffer, format=pil_format, quality=quality, **options)
+                    if buffer.tell() >= src_size:
+                        if os.path.exists(out_path):
+                            os.remove(out_path)
+                        open(out_path + SKIP_SUFFIX, 'wb').close()
+                        continue
+                    with open(out_path, 'wb') as f:
+                        f.write(buffer.getvalue())
+                    written += 1
+    return written
+
+
+def generate_variants(img_dirs=IMG_DIRS, force=False):
+    """Gera as variantes de todas as imagens das pastas informadas"""
+    if _pil_image() is None:
+        print("❌ Pillow não encontrado. Instale com: pip install Pillow")
+        return False
+
+    formats = supported_formats()
+    print(f"🖼️ Formatos de variantes: {', '.join(f[2] for f in formats)}")
+    total_images = total_written = 0
+    for img_dir in img_dirs:
+        src_dir = os.path.join(BASE_DIR, img_dir)
+        if not os.path.isdir(src_dir):
+            continue
+        out_dir = os.path.join(src_dir, VARIANTS_DIR)
+        os.makedirs(out_dir, exist_ok=True)
+        for filename in sorted(os.listdir(src_dir)):
+            if not filename.lower().endswith(SOURCE_EXTENSIONS):
+                continue
+            try:
+                total_written += generate_for_image(os.path.join(src_dir, filename), out_dir, formats, force)
+                total_images += 1
+            except Exception as e:
+                print(f"❌ Erro ao gerar variantes de {img_dir}/{filename}: {e}")
+
+    print(f"✅ {total_images} imagens verificadas, {total_written} variantes geradas")
+    return True
+
+
+# ----------------------
+# Seleção da variante em tempo de requisição
+# ----------------------
+
+def _parse_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def requested_width(args, headers):
+    """Largura em pixels físicos pedida via ?w=, Sec-CH-Width/Width e DPR"""
+    width = _parse_number(headers.get('Sec-CH-Width') or headers.get('Width'))
+    if width is not None:
+        # Client hints de largura já vêm em pixels físicos
+        return width
+    width = _parse_number(args.get('w'))
+    if width is None:
+        return None
+    dpr = _parse_number(args.get('dpr') or headers.get('Sec-CH-DPR') or headers.get('DPR')) or 1.0
+    return width * min(max(dpr, 1.0), 4.0)
+
+
+def pick_variant(rel_path, accept, width, save_data=False, base_dir=BASE_DIR):
+    """Escolhe a melhor variante existente para a requisição (ou None = original)"""
+    if width is None:
+        return None
+    tier = 'low' if save_data else 'high'
+    # Acima da maior variante o original (que nunca é ampliado) é a melhor opção
+    candidates = [w for w in WIDTHS if w >= width]
+    accept = accept or ''
+    for mime, ext, _ in FORMATS:
+        if mime not in accept:
+            continue
+        for candidate in candidates:
+            path = variant_path(rel_path, candidate, tier, ext)
+            if os.path.exists(os.path.join(base_dir, path)):
+                return path
+    return None
+
+
+def main():
+    force = '--force' in sys.argv
+    return generate_variants(force=force)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -1,6 +1,8 @@
 import os
 import re
+import sys
 import json
+import hashlib
 import sqlite3
 from io import BytesIO
 
@@ -82,12 +84,81 @@ def get_images_for_year(year: int):
     files = [f for f in os.listdir(dir_) if f.lower().endswith('.webp') or f.lower().endswith(('.png', '.jpg', '.jpeg'))]
     def key(f):
         m = re.search(r'questao_(\d+)', f)
-        return int(m.group(1)) if m else 0
+        # Com .png e .webp do mesmo número, o arquivo de origem (não-webp) vem primeiro
+        return (int(m.group(1)) if m else 0, f.lower().endswith('.webp'))
     files.sort(key=key)
     return files
 
 
-def import_year(year: int):
+QUESTOES_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS questoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        enunciado TEXT,
+        a TEXT,
+        b TEXT,
+        c TEXT,
+        d TEXT,
+        e TEXT,
+        gabarito TEXT,
+        fonte TEXT,
+        imagens TEXT DEFAULT '[]',
+        tipo TEXT DEFAULT 'completa'
+    )
+'''
+
+# Colunas usadas pela importação incremental (adicionadas em bancos antigos)
+INCREMENTAL_COLUMNS = {
+    'numero': 'INTEGER',
+    'content_hash': 'TEXT',
+    'image_hash': 'TEXT',
+}
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_hash(row: tuple) -> str:
+    """Hash do conteúdo textual gravado para a questão"""
+    return hashlib.sha256(json.dumps(row, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def ensure_schema(cur):
+    """Cria a tabela e migra bancos antigos para a chave (fonte, numero)"""
+    cur.execute(QUESTOES_SCHEMA)
+    existing = {row[1] for row in cur.execute('PRAGMA table_info(questoes)')}
+    for column, kind in INCREMENTAL_COLUMNS.items():
+        if column not in existing:
+            cur.execute(f'ALTER TABLE questoes ADD COLUMN {column} {kind}')
+
+    # Questões importadas antes da migração: número extraído do enunciado
+    missing = cur.execute(
+        'SELECT id, enunciado FROM questoes WHERE numero IS NULL'
+    ).fetchall()
+    for qid, enunciado in missing:
+        m = re.match(r'^Questão\s+(\d+)\s+-', enunciado or '')
+        if m:
+            cur.execute('UPDATE questoes SET numero = ? WHERE id = ?', (int(m.group(1)), qid))
+
+    cur.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_questoes_fonte_numero
+        ON questoes (fonte, numero)
+    ''')
+
+
+def import_year(year: int, force: bool = False):
+    """Importa (incrementalmente) as questões de um ano.
+
+    As questões são identificadas por (fonte, numero): as inalteradas são
+    puladas, as alteradas são atualizadas no mesmo id (preservando os
+    `questoes_ids` gravados nos simulados) e só imagens modificadas são
+    reconvertidas. Com `force=True` todas as questões e imagens são
+    regravadas, ainda mantendo os ids.
+    """
     txt_file = TEXT_FILES[year]
     img_dir = IMG_DIRS[year]
     fonte = FONTE[year]
@@ -99,7 +170,7 @@ def import_year(year: int):
     with open(txt_file, 'r', encoding='utf-8') as f:
         text = f.read()
     questions = parse_questions_from_txt(text)
-    qdict = {q['numero']: q for q in questions}
+    qdict = {int(q['numero']): q for q in questions}
 
     images = get_images_for_year(year)
     if not images:
@@ -108,68 +179,87 @@ def import_year(year: int):
 
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
+    ensure_schema(cur)
 
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS questoes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            enunciado TEXT,
-            a TEXT,
-            b TEXT,
-            c TEXT,
-            d TEXT,
-            e TEXT,
-            gabarito TEXT,
-            fonte TEXT,
-            imagens TEXT DEFAULT '[]',
-            tipo TEXT DEFAULT 'completa'
-        )
-    ''')
+    existing = {}
+    for row in cur.execute('''
+        SELECT numero, content_hash, image_hash, enunciado, a, b, c, d, e, gabarito, fonte, imagens
+        FROM questoes WHERE fonte = ?
+    ''', (fonte,)):
+        # Linhas anteriores à migração: hash calculado a partir do conteúdo gravado
+        existing[row[0]] = (row[1] or content_hash(row[3:]), row[2])
 
-    cur.execute('DELETE FROM questoes WHERE fonte = ?', (fonte,))
-
-    imported = 0
+    imported = unchanged = 0
+    seen = set()
     for filename in images:
         m = re.search(r'questao_(\d+)', filename)
         if not m:
             continue
-        num = m.group(1)
+        num = int(m.group(1))
         if num not in qdict:
             print(f"[ {year} ] Sem alternativas para questão {num}")
             continue
+        if num in seen:
+            # O .webp gerado a partir do original já foi tratado
+            continue
+        seen.add(num)
 
         src_path = os.path.join(img_dir, filename)
+        image_hash = file_hash(src_path)
+        stored_content, stored_image = existing.get(num, (None, None))
+
         # Normalize/convert to webp in place directory
-        rel_path = filename
         if not filename.lower().endswith('.webp'):
-            rel_path = save_webp(src_path, img_dir, f"questao_{num}")
+            webp_name = f"questao_{num}.webp"
+            rel_path = os.path.join(os.path.basename(img_dir), webp_name).replace('\\', '/')
+            if force or image_hash != stored_image or not os.path.exists(os.path.join(img_dir, webp_name)):
+                rel_path = save_webp(src_path, img_dir, webp_name)
         else:
             rel_path = os.path.join(os.path.basename(img_dir), filename).replace('\\', '/')
 
         q = qdict[num]
-        imagens_json = json.dumps([rel_path], ensure_ascii=False)
-
-        cur.execute('''
-            INSERT INTO questoes (enunciado, a, b, c, d, e, gabarito, fonte, imagens)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        row = (
             f"Questão {num} - {fonte}",
             q['a'], q['b'], q['c'], q['d'], q['e'],
-            q['gabarito'], fonte, imagens_json
-        ))
+            q['gabarito'], fonte, json.dumps([rel_path], ensure_ascii=False)
+        )
+        row_hash = content_hash(row)
+        if not force and row_hash == stored_content and image_hash == stored_image:
+            unchanged += 1
+            continue
+
+        cur.execute('''
+            INSERT INTO questoes (enunciado, a, b, c, d, e, gabarito, fonte, imagens, numero, content_hash, image_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (fonte, numero) DO UPDATE SET
+                enunciado = excluded.enunciado,
+                a = excluded.a, b = excluded.b, c = excluded.c, d = excluded.d, e = excluded.e,
+                gabarito = excluded.gabarito,
+                imagens = excluded.imagens,
+                content_hash = excluded.content_hash,
+                image_hash = excluded.image_hash
+        ''', row + (num, row_hash, image_hash))
         imported += 1
-        print(f"[ {year} ] ✅ Importada questão {num} -> {rel_path}")
+        action = 'Atualizada' if num in existing else 'Importada'
+        print(f"[ {year} ] ✅ {action} questão {num} -> {rel_path}")
+
+    # Questões que sumiram do TXT/imagens ficam no banco: simulados antigos ainda as referenciam
+    orphaned = set(existing) - seen
+    if orphaned:
+        print(f"[ {year} ] ⚠️ {len(orphaned)} questões no banco sem arquivo correspondente (mantidas)")
 
     conn.commit()
     conn.close()
-    print(f"[ {year} ] Importadas {imported} questões")
+    print(f"[ {year} ] Importadas/atualizadas {imported} questões, {unchanged} sem alterações")
     return imported
 
 
 def main():
+    force = '--force' in sys.argv
     total = 0
     for y in YEARS:
         try:
-            total += import_year(y)
+            total += import_year(y, force=force)
         except Exception as e:
             print(f"[ {y} ] Erro: {e}")
     print(f"Total importadas: {total}")
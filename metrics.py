@@ -0,0 +1,328 @@
+"""
+Métricas do app no formato texto do Prometheus (GET /metrics).
+
+- Latência por rota (histograma), total de requisições por rota, método e
+  status, e tamanho das respostas;
+- Consultas SQL: quantidade e duração por tipo de statement e, por
+  requisição, quantas consultas cada rota fez e quanto tempo gastou nelas
+  (ex.: quantas consultas /api/simulados/current faz).
+
+As consultas são medidas pelas conexões do pool (db_pool abre as conexões
+com `InstrumentedConnection`), então tudo que passa por `get_pool` — app,
+SimuladosSystemV2Improved, catálogo, estatísticas — é contado sem mudar
+quem chama. O tempo medido é o do `execute` (preparo e primeiro passo do
+statement); leituras posteriores de linhas não entram.
+
+As métricas são por processo: com vários workers do gunicorn cada coleta
+vê apenas o worker que a atendeu. Com METRICS_TOKEN definido, /metrics
+exige `Authorization: Bearer <token>`; sem ele, só responde a requisições
+locais (127.0.0.1/::1, sem cabeçalhos de proxy) e devolve 404 às demais.
+"""
+
+import bisect
+import contextvars
+import hmac
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Response, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Sem METRICS_TOKEN, /metrics só responde a estes endereços
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+# Buckets (limites superiores) dos histogramas
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SQL_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Tipos de statement usados como rótulo (o texto da consulta não vira rótulo)
+STATEMENT_KINDS = frozenset((
+    'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH',
+    'PRAGMA', 'CREATE', 'DROP', 'ALTER', 'BEGIN', 'COMMIT', 'ROLLBACK',
+))
+
+# Rótulo de requisições que não casaram com nenhuma rota (evita um rótulo por URL)
+UNMATCHED_ROUTE = 'sem_rota'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Counter:
+    """Contador monotônico com rótulos"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """Histograma cumulativo (buckets, soma e contagem) com rótulos"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # [contagem por bucket (+Inf no fim), soma, total]
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        bounds = self.buckets + (float('inf'),)
+        for label_values, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, label_values, [('le', _format_value(float(bound)))])
+                yield f'{self.name}_bucket', labels, cumulative
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class Registry:
+    """Conjunto de métricas exportadas juntas"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        """Todas as métricas no formato texto do Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'simulados_http_requests_total', 'Requisições HTTP atendidas', ('route', 'method', 'status'))
+http_latency = registry.histogram(
+    'simulados_http_request_duration_seconds', 'Latência das requisições HTTP', ('route', 'method'))
+http_response_size = registry.histogram(
+    'simulados_http_response_size_bytes', 'Tamanho do corpo das respostas (após compressão)',
+    ('route',), SIZE_BUCKETS)
+request_queries = registry.histogram(
+    'simulados_http_request_sql_queries', 'Consultas SQL feitas por requisição', ('route',),
+    QUERY_COUNT_BUCKETS)
+request_sql_time = registry.histogram(
+    'simulados_http_request_sql_duration_seconds', 'Tempo em consultas SQL por requisição', ('route',),
+    sorted(set(SQL_LATENCY_BUCKETS + LATENCY_BUCKETS)))
+sql_queries = registry.counter(
+    'simulados_sql_queries_total', 'Consultas SQL executadas', ('statement',))
+sql_latency = registry.histogram(
+    'simulados_sql_query_duration_seconds', 'Duração das consultas SQL', ('statement',),
+    SQL_LATENCY_BUCKETS)
+
+
+# ----------------------
+# Consultas SQL
+# ----------------------
+
+class RequestStats:
+    """Consultas SQL da requisição atual"""
+
+    __slots__ = ('queries', 'sql_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+
+# Acompanha o contexto da requisição, inclusive quando a view roda em outra
+# thread (BlockingExecutor copia o contexto)
+_current = contextvars.ContextVar('simulados_request_stats', default=None)
+
+
+def statement_kind(sql):
+    words = sql.lstrip().split(None, 1)
+    kind = words[0].upper() if words else ''
+    return kind if kind in STATEMENT_KINDS else 'OUTRO'
+
+
+def record_query(sql, seconds):
+    kind = statement_kind(sql)
+    sql_queries.inc(kind)
+    sql_latency.observe(seconds, kind)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_seconds += seconds
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que registra quantidade e duração de cada statement"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record_query(sql_script, time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexão cujos cursores são instrumentados.
+
+    `Connection.execute` cria o cursor internamente (sem passar por
+    `cursor()`), por isso os atalhos também são redefinidos aqui.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+# ----------------------
+# Requisições HTTP
+# ----------------------
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else UNMATCHED_ROUTE
+
+
+def start_request():
+    """Marca o início da requisição (before_request)"""
+    stats = RequestStats()
+    _current.set(stats)
+    request.environ['simulados.metrics'] = (time.perf_counter(), stats)
+
+
+def _count_streamed(chunks, route):
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        http_response_size.observe(size, route)
+
+
+def finish_request(response):
+    """Registra latência, consultas e tamanho da resposta (after_request)"""
+    started = request.environ.pop('simulados.metrics', None)
+    if started is None:
+        return response
+    start, stats = started
+    _current.set(None)
+
+    route = _route()
+    http_latency.observe(time.perf_counter() - start, route, request.method)
+    http_requests.inc(route, request.method, str(response.status_code))
+    request_queries.observe(stats.queries, route)
+    request_sql_time.observe(stats.sql_seconds, route)
+
+    if response.content_length is not None:
+        http_response_size.observe(response.content_length, route)
+    elif response.is_streamed and not response.direct_passthrough:
+        response.response = _count_streamed(response.response, route)
+    return response
+
+
+def _is_local_request():
+    """Requisição feita da própria máquina, sem passar por um proxy"""
+    if request.headers.get('X-Forwarded-For') or request.headers.get('Forwarded'):
+        return False
+    return request.remote_addr in LOCAL_ADDRESSES
+
+
+def metrics_response():
+    """GET /metrics: com METRICS_TOKEN exige o token; sem ele, só acesso local"""
+    if METRICS_TOKEN:
+        auth = request.headers.get('Authorization', '').encode('utf-8', 'surrogateescape')
+        if not hmac.compare_digest(auth, f'Bearer {METRICS_TOKEN}'.encode('utf-8')):
+            return Response('não autorizado\n', status=401, content_type=CONTENT_TYPE)
+    elif not _is_local_request():
+        return Response('não encontrado\n', status=404, content_type=CONTENT_TYPE)
+    response = Response(registry.render(), content_type=CONTENT_TYPE)
+    response.cache_control.no_store = True
+    return response
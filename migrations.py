@@ -0,0 +1,47 @@
+"""
+Migrações de esquema versionadas por `PRAGMA user_version`.
+
+Cada migração roda uma única vez por banco, em ordem. Se uma tabela de que
+ela depende ainda não existe (ex.: `questoes` antes da primeira importação),
+a migração fica pendente e é tentada de novo na próxima inicialização.
+"""
+
+# (versão, descrição, tabelas necessárias, script)
+MIGRATIONS = (
+    (1, 'índices de questoes e simulados', ('questoes', 'simulados'), '''
+        -- Questões por prova (ada.get_questions_by_exam, contagem por prova)
+        CREATE INDEX IF NOT EXISTS idx_questoes_fonte ON questoes (fonte, id, enunciado);
+        -- Histórico por usuário e histórico geral, mais recentes primeiro
+        CREATE INDEX IF NOT EXISTS idx_simulados_user_data ON simulados (user_id, data_criacao, id);
+        CREATE INDEX IF NOT EXISTS idx_simulados_data ON simulados (data_criacao, id);
+    '''),
+)
+
+
+def schema_version(conn):
+    """Versão de esquema gravada no banco"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _tables_exist(conn, tables):
+    placeholders = ','.join('?' * len(tables))
+    found = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+        tables,
+    ).fetchone()[0]
+    return found == len(tables)
+
+
+def migrate(conn):
+    """Aplica as migrações pendentes; retorna a versão final do esquema"""
+    version = schema_version(conn)
+    for target, description, tables, script in MIGRATIONS:
+        if target <= version:
+            continue
+        if not _tables_exist(conn, tables):
+            break
+        # executescript não aceita parâmetros: a versão é um inteiro da lista acima
+        conn.executescript(f'BEGIN; {script}; PRAGMA user_version = {int(target)}; COMMIT;')
+        version = target
+        print(f"🛠️ Migração {target} aplicada: {description}")
+    return version
@@ -0,0 +1,274 @@
+import json
+import marshal
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from catalog_schema import CATALOG_SCHEMA
+from db_pool import DB_PATH, get_pool
+from static_assets import asset_url, fingerprints
+
+# Intervalo mínimo (segundos) entre verificações da versão do catálogo no banco
+CHECK_INTERVAL = 5.0
+
+# Versão do formato do arquivo de snapshot do catálogo
+SNAPSHOT_FORMAT = 1
+
+
+def is_valid_question(question):
+    """Questão é válida para simulado se tem pelo menos 3 alternativas preenchidas"""
+    # Temporariamente aceitamos gabarito "?" devido a problemas de dados
+    alternatives = (question['a'], question['b'], question['c'], question['d'], question['e'])
+    return sum(1 for alt in alternatives if alt and alt.strip()) >= 3
+
+
+def question_payload(question, bloco=None):
+    """Objeto homogêneo de uma questão para a API (colunas opcionais com padrão)"""
+    payload = {
+        'id': question['id'], 'enunciado': question.get('enunciado') or '',
+        'a': question['a'] or '', 'b': question['b'] or '', 'c': question['c'] or '',
+        'd': question['d'] or '', 'e': question['e'] or '',
+        'gabarito': question['gabarito'] or '', 'fonte': question['fonte'] or '',
+        'imagens': question.get('imagens') or '[]',
+        'tipo': question.get('tipo') or 'completa'
+    }
+    if bloco is not None:
+        payload['bloco'] = bloco
+    return payload
+
+
+def _parse_images(raw):
+    if not raw:
+        return ()
+    try:
+        images = json.loads(raw)
+    except (TypeError, ValueError):
+        return ()
+    return tuple(images) if isinstance(images, list) else ()
+
+
+def _fingerprint_question(question, images):
+    """Troca caminhos de arquivos (imagens e alternativas em imagem) pelas URLs com hash"""
+    fingerprinted = tuple(asset_url(image) for image in images)
+    if fingerprinted != images:
+        question['imagens'] = json.dumps(list(fingerprinted), ensure_ascii=False)
+    for letter in ('a', 'b', 'c', 'd', 'e'):
+        if letter in question:
+            question[letter] = asset_url(question[letter])
+    return fingerprinted
+
+
+class CatalogSnapshot:
+    """Fotografia imutável da tabela `questoes` em memória.
+
+    `questions` indexa as questões por id (cada uma é um mapeamento somente
+    leitura com as colunas da tabela) e `ids` traz todos os ids em ordem
+    crescente; `by_fonte` guarda os ids de cada prova em ordem crescente,
+    `valid_by_fonte` apenas os ids válidos para simulados e `images` as
+    listas de imagens já decodificadas. Caminhos de arquivos já vêm
+    reescritos para as URLs com fingerprint.
+    """
+
+    __slots__ = ('version', 'columns', 'questions', 'ids', 'by_fonte', 'valid_by_fonte', 'images')
+
+    def __init__(self, version, columns, rows):
+        questions = {}
+        by_fonte = {}
+        valid_by_fonte = {}
+        images = {}
+        for row in rows:
+            question = dict(zip(columns, row))
+            qid = question['id']
+            fonte = question['fonte']
+            images[qid] = _fingerprint_question(question, _parse_images(question.get('imagens')))
+            question = questions[qid] = MappingProxyType(question)
+            by_fonte.setdefault(fonte, []).append(qid)
+            valid = valid_by_fonte.setdefault(fonte, [])
+            if is_valid_question(question):
+                valid.append(qid)
+        self.version = version
+        self.columns = tuple(columns)
+        self.questions = MappingProxyType(questions)
+        self.ids = tuple(questions)
+        self.by_fonte = MappingProxyType({f: tuple(ids) for f, ids in by_fonte.items()})
+        self.valid_by_fonte = MappingProxyType({f: tuple(ids) for f, ids in valid_by_fonte.items()})
+        self.images = MappingProxyType(images)
+
+    def get(self, question_id):
+        """Retorna a questão (somente leitura) ou None"""
+        return self.questions.get(question_id)
+
+    def ids_for(self, fonte):
+        """Ids das questões de uma prova, em ordem crescente"""
+        return self.by_fonte.get(fonte, ())
+
+    def valid_ids_for(self, fonte):
+        """Ids das questões válidas para simulado de uma prova"""
+        return self.valid_by_fonte.get(fonte, ())
+
+    def hydrate(self, question_ids, blocos=None):
+        """Resolve uma lista de ids de uma vez, preservando a ordem e os blocos.
+
+        Ids inexistentes no catálogo são ignorados.
+        """
+        if blocos is None:
+            blocos = [None] * len(question_ids)
+        hydrated = []
+        for qid, bloco in zip(question_ids, blocos):
+            question = self.questions.get(qid)
+            if question is None:
+                print(f"Questão {qid} não encontrada no catálogo")
+                continue
+            hydrated.append(question_payload(question, bloco))
+        return hydrated
+
+    def __len__(self):
+        return len(self.questions)
+
+
+class QuestionCatalog:
+    """Catálogo de questões carregado uma vez e servido da memória.
+
+    A cada `snapshot()` a versão gravada em `catalog_meta` é conferida no
+    máximo uma vez a cada `check_interval` segundos; se um importador tiver
+    escrito na tabela, o catálogo é reconstruído.
+
+    Com `snapshot_path` definido, as linhas de `questoes` e os hashes das
+    imagens são guardados em um arquivo compacto (marshal); na próxima
+    inicialização, se a versão do catálogo não mudou, o catálogo é montado
+    a partir dele, sem ler a tabela nem recalcular os hashes.
+    """
+
+    def __init__(self, db_path=DB_PATH, check_interval=CHECK_INTERVAL, snapshot_path=None):
+        self.pool = get_pool(db_path)
+        self.check_interval = check_interval
+        self.snapshot_path = snapshot_path
+        self._snapshot = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        """Cria o contador de versão e os triggers (se `questoes` existir)"""
+        with self.pool.connection() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questoes'"
+            ).fetchone()
+            if exists:
+                conn.executescript(CATALOG_SCHEMA)
+                self._schema_ready = True
+
+    def _read_version(self, conn):
+        try:
+            row = conn.execute('SELECT version FROM catalog_meta WHERE id = 1').fetchone()
+        except Exception:
+            return 0
+        return row[0] if row else 0
+
+    def _stamp(self, conn):
+        """Identifica o conteúdo de `questoes`: (versão, total de linhas, maior id)"""
+        count, max_id = conn.execute('SELECT COUNT(*), MAX(id) FROM questoes').fetchone()
+        return [self._read_version(conn), count, max_id]
+
+    def _load_snapshot_file(self, stamp):
+        """(colunas, linhas) do arquivo de snapshot, se ainda corresponder ao banco"""
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(data, dict) or data.get('format') != SNAPSHOT_FORMAT or data.get('stamp') != stamp:
+            return None
+        fingerprints.preload(data['fingerprints'])
+        return data['columns'], data['rows']
+
+    def _write_snapshot_file(self, stamp, columns, rows):
+        data = {
+            'format': SNAPSHOT_FORMAT,
+            'stamp': stamp,
+            'columns': list(columns),
+            'rows': rows,
+            'fingerprints': fingerprints.export(),
+        }
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            marshal.dump(data, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _read_rows(self, conn):
+        cursor = conn.execute('SELECT * FROM questoes ORDER BY id')
+        return [c[0] for c in cursor.description], [tuple(row) for row in cursor]
+
+    def save_snapshot(self):
+        """Regrava o arquivo de snapshot a partir do banco (ex.: no build)"""
+        if not self.snapshot_path or not self._schema_ready:
+            return False
+        conn = self.pool.get()
+        stamp = self._stamp(conn)
+        columns, rows = self._read_rows(conn)
+        # Calcula (ou confere) os hashes das imagens antes de exportá-los
+        CatalogSnapshot(stamp[0], columns, rows)
+        self._write_snapshot_file(stamp, columns, rows)
+        return True
+
+    def _build(self):
+        if not self._schema_ready:
+            self.ensure_schema()
+        conn = self.pool.get()
+        version = self._read_version(conn)
+        if not self._schema_ready:
+            return CatalogSnapshot(version, ('id', 'fonte'), [])
+        if not self.snapshot_path:
+            return CatalogSnapshot(version, *self._read_rows(conn))
+        stamp = self._stamp(conn)
+        stored = self._load_snapshot_file(stamp)
+        if stored is not None:
+            return CatalogSnapshot(version, *stored)
+        columns, rows = self._read_rows(conn)
+        snap = CatalogSnapshot(version, columns, rows)
+        try:
+            self._write_snapshot_file(stamp, columns, rows)
+        except OSError as e:
+            print(f"⚠️  Não foi possível gravar o snapshot do catálogo: {e}")
+        return snap
+
+    def snapshot(self):
+        """Retorna a fotografia atual, recarregando se a versão mudou"""
+        snap = self._snapshot
+        now = time.monotonic()
+        if snap is not None and now - self._checked_at < self.check_interval:
+            return snap
+        with self._lock:
+            snap = self._snapshot
+            stale = (
+                snap is None
+                or not self._schema_ready
+                or self._read_version(self.pool.get()) != snap.version
+            )
+            if stale:
+                snap = self._snapshot = self._build()
+                print(f"📚 Catálogo carregado: {len(snap)} questões (versão {snap.version})")
+            self._checked_at = now
+        return snap
+
+    def invalidate(self):
+        """Força a verificação da versão na próxima leitura"""
+        self._checked_at = float('-inf')
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(db_path=DB_PATH):
+    """Retorna o catálogo compartilhado para o banco informado"""
+    pool = get_pool(db_path)
+    catalog = _catalogs.get(pool)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(pool)
+            if catalog is None:
+                catalog = _catalogs[pool] = QuestionCatalog(db_path)
+    return catalog
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Recorreção de simulados após mudanças de gabarito.
+
+Importadores e o ada.py podem sobrescrever `questoes.gabarito` (ex.: quando
+um gabarito "?" é corrigido), mas os acertos gravados em `simulados` e
+`simulado_answers` refletem o gabarito do momento da submissão. Este job
+percorre, em lotes por id, os simulados cujas respostas gravadas divergem do
+gabarito atual, recorrige cada um com as respostas armazenadas (grading.grade)
+e grava os novos acertos, erros e percentuais em uma transação por lote.
+Ao final os agregados (simulado_stats, exam_stats e os analytics por
+usuário) são recalculados.
+
+O progresso fica em `regrade_jobs`, atualizado na mesma transação de cada
+lote: se o job for interrompido, a próxima execução continua do último
+simulado recorrigido.
+
+Uso: python regrade.py [--restart] [--batch-size N] [--db caminho]
+"""
+
+import sys
+import time
+from datetime import datetime
+
+from db_pool import DB_PATH, get_pool
+from grading import grade
+from simulado_results import SimuladoResults
+from simulado_stats import SimuladoStats
+from user_analytics import UserAnalytics
+
+BATCH_SIZE = 200
+
+REGRADE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS regrade_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        iniciado_em TEXT NOT NULL,
+        atualizado_em TEXT NOT NULL,
+        ultimo_simulado_id INTEGER NOT NULL DEFAULT 0,
+        recorrigidos INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'corrigindo'
+    )
+'''
+
+# Gabarito atual como o simulado o vê (questão sem gabarito ou removida vira "?")
+CURRENT_KEY = "COALESCE(NULLIF(q.gabarito, ''), '?')"
+
+
+def _open_job(conn, restart=False):
+    """Job em andamento (para retomar) ou um novo"""
+    if restart:
+        conn.execute("UPDATE regrade_jobs SET status = 'cancelado' WHERE status != 'concluido'")
+    else:
+        job = conn.execute(
+            "SELECT * FROM regrade_jobs WHERE status != 'concluido' AND status != 'cancelado' ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if job is not None:
+            return dict(job)
+    now = datetime.now().isoformat()
+    cursor = conn.execute(
+        'INSERT INTO regrade_jobs (iniciado_em, atualizado_em) VALUES (?, ?)', (now, now)
+    )
+    return dict(conn.execute('SELECT * FROM regrade_jobs WHERE id = ?', (cursor.lastrowid,)).fetchone())
+
+
+def affected_ids(conn, after_id, limit):
+    """Próximos simulados (id > after_id) com alguma resposta corrigida por outro gabarito"""
+    rows = conn.execute(f'''
+        SELECT DISTINCT a.simulado_id FROM simulado_answers a
+        LEFT JOIN questoes q ON q.id = a.questao_id
+        WHERE a.simulado_id > ? AND a.correta IS NOT NULL
+          AND LOWER(COALESCE(a.gabarito, '')) != LOWER({CURRENT_KEY})
+        ORDER BY a.simulado_id
+        LIMIT ?
+    ''', (after_id, limit)).fetchall()
+    return [row[0] for row in rows]
+
+
+def regrade_batch(conn, ids):
+    """Recorrige os simulados `ids` com o gabarito atual (na transação de `conn`)"""
+    placeholders = ','.join('?' * len(ids))
+    simulados = {
+        row['id']: row for row in conn.execute(
+            f'SELECT id, num_questoes, acertos, erros FROM simulados WHERE id IN ({placeholders})', ids
+        )
+    }
+    answers = {}
+    for row in conn.execute(f'''
+        SELECT a.simulado_id, a.numero, a.questao_id, a.bloco, a.resposta, a.pulada,
+               {CURRENT_KEY} AS gabarito
+        FROM simulado_answers a LEFT JOIN questoes q ON q.id = a.questao_id
+        WHERE a.simulado_id IN ({placeholders})
+        ORDER BY a.simulado_id, a.numero
+    ''', ids):
+        answers.setdefault(row['simulado_id'], []).append(row)
+
+    score_updates = []
+    answer_updates = []
+    for simulado_id, rows in answers.items():
+        simulado = simulados.get(simulado_id)
+        if simulado is None:
+            continue
+        questions = [{'id': r['questao_id'], 'bloco': r['bloco'], 'gabarito': r['gabarito']} for r in rows]
+        responses = {r['questao_id']: r['resposta'] for r in rows if r['resposta'] is not None}
+        skipped = [i for i, r in enumerate(rows) if r['pulada']]
+        graded = grade(questions, responses, skipped)
+
+        # Respostas para questões fora do simulado contavam como erro e não são gravadas
+        extra_wrong = max(0, (simulado['acertos'] or 0) + (simulado['erros'] or 0) - len(responses))
+        num_questoes = simulado['num_questoes'] or 0
+        percentual = (graded['correct'] / num_questoes) * 100 if num_questoes > 0 else 0
+        score_updates.append((graded['correct'], graded['wrong'] + extra_wrong, percentual, simulado_id))
+        answer_updates.extend(
+            (q['gabarito'], int(q['correta']), simulado_id, r['numero'])
+            for r, q in zip(rows, graded['details']['questions'])
+        )
+
+    conn.executemany(
+        'UPDATE simulados SET acertos = ?, erros = ?, percentual_acerto = ? WHERE id = ?', score_updates
+    )
+    conn.executemany(
+        'UPDATE simulado_answers SET gabarito = ?, correta = ? WHERE simulado_id = ? AND numero = ?',
+        answer_updates,
+    )
+    return len(score_updates)
+
+
+def run(db_path=DB_PATH, batch_size=BATCH_SIZE, restart=False):
+    """Executa (ou retoma) a recorreção; retorna o job concluído"""
+    pool = get_pool(db_path)
+    # Garante as tabelas normalizadas e os agregados antes de recorrigir
+    SimuladoResults(db_path)
+    stats = SimuladoStats(db_path)
+    analytics = UserAnalytics(db_path)
+
+    with pool.connection() as conn:
+        conn.execute(REGRADE_SCHEMA)
+        job = _open_job(conn, restart)
+    if job['ultimo_simulado_id'] or job['status'] != 'corrigindo':
+        print(f"↩️  Retomando recorreção #{job['id']} após o simulado {job['ultimo_simulado_id']}")
+
+    start = time.perf_counter()
+    while job['status'] == 'corrigindo':
+        with pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            ids = affected_ids(conn, job['ultimo_simulado_id'], batch_size)
+            if ids:
+                job['recorrigidos'] += regrade_batch(conn, ids)
+                job['ultimo_simulado_id'] = ids[-1]
+            if len(ids) < batch_size:
+                job['status'] = 'agregados'
+            conn.execute('''
+                UPDATE regrade_jobs SET ultimo_simulado_id = ?, recorrigidos = ?, status = ?, atualizado_em = ?
+                WHERE id = ?
+            ''', (job['ultimo_simulado_id'], job['recorrigidos'], job['status'], datetime.now().isoformat(), job['id']))
+        if ids:
+            print(f"📝 {job['recorrigidos']} simulados recorrigidos (até o id {job['ultimo_simulado_id']})")
+
+    if job['status'] == 'agregados':
+        with pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if job['recorrigidos']:
+                stats.rebuild(conn)
+                analytics.rebuild(conn)
+            job['status'] = 'concluido'
+            conn.execute(
+                'UPDATE regrade_jobs SET status = ?, atualizado_em = ? WHERE id = ?',
+                (job['status'], datetime.now().isoformat(), job['id']),
+            )
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Recorreção #{job['id']} concluída: {job['recorrigidos']} simulados em {elapsed:.1f}s")
+    return job
+
+
+def _option(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+
+def main():
+    run(
+        db_path=_option('--db', DB_PATH),
+        batch_size=max(1, int(_option('--batch-size', BATCH_SIZE))),
+        restart='--restart' in sys.argv,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import json
+import threading
+
+from flask import request
+
+from compression import CompressedBody, compressed_response
+
+
+class CachedResponse(CompressedBody):
+    """Corpo JSON já serializado, com ETag e versões comprimidas"""
+
+    def __init__(self, version, data):
+        super().__init__(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        self.version = version
+
+
+class VersionedResponseCache:
+    """Respostas da API calculadas uma vez por versão dos dados de origem.
+
+    Cada chave guarda a última resposta e a versão com que foi calculada
+    (ex.: a versão do catálogo, incrementada por trigger a cada escrita em
+    `questoes`); enquanto a versão não muda, o corpo serializado e o ETag
+    são reaproveitados sem consultar o banco nem serializar de novo.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, build):
+        """Resposta de `key` na `version` atual, chamando `build()` se necessário"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            return entry
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                entry = self._entries[key] = CachedResponse(version, build())
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def cached_json_response(entry, max_age=0):
+    """Resposta com ETag forte; `If-None-Match` igual devolve 304 sem corpo.
+
+    `max_age=0` obriga o navegador (ou proxy) a revalidar a cada uso.
+    """
+    response = compressed_response(entry, 'application/json')
+    response.cache_control.public = True
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
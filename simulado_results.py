@@ -0,0 +1,304 @@
+import base64
+import json
+from datetime import datetime
+
+from db_pool import DB_PATH, get_pool
+from simulado_stats import parse_duration
+
+# Quantidade de blocos usados no resumo de acertos (details.accuracies)
+NUM_BLOCKS = 4
+
+RESULTS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS simulado_exams (
+        simulado_id INTEGER NOT NULL,
+        posicao INTEGER NOT NULL,
+        fonte TEXT NOT NULL,
+        PRIMARY KEY (simulado_id, posicao)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_simulado_exams_fonte
+    ON simulado_exams (fonte, simulado_id);
+
+    CREATE TABLE IF NOT EXISTS simulado_answers (
+        simulado_id INTEGER NOT NULL,
+        numero INTEGER NOT NULL,
+        questao_id INTEGER NOT NULL,
+        bloco INTEGER,
+        gabarito TEXT,
+        resposta TEXT,
+        correta INTEGER,
+        pulada INTEGER,
+        PRIMARY KEY (simulado_id, numero)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_simulado_answers_questao
+    ON simulado_answers (questao_id);
+'''
+
+# Campos de um resultado na API (o parâmetro `fields` escolhe um subconjunto)
+RESULT_FIELDS = frozenset((
+    'id', 'data_criacao', 'user_id', 'provas_selecionadas', 'num_questoes', 'questoes_ids',
+    'tempo_total', 'acertos', 'erros', 'puladas', 'percentual_acerto', 'details',
+))
+
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+SUMMARY_COLUMNS = (
+    'id', 'data_criacao', 'user_id', 'num_questoes', 'tempo_total', 'duration_seconds',
+    'acertos', 'erros', 'puladas', 'percentual_acerto',
+)
+
+
+def _json_list(raw):
+    if not raw:
+        return []
+    try:
+        value = json.loads(raw)
+    except (TypeError, ValueError):
+        return []
+    return value if isinstance(value, list) else []
+
+
+def encode_cursor(data_criacao, simulado_id):
+    """Cursor opaco da paginação do histórico"""
+    raw = json.dumps([data_criacao, simulado_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(data_criacao, id) de um cursor; ValueError se inválido"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data_criacao, simulado_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('cursor inválido')
+    if not isinstance(data_criacao, str) or not isinstance(simulado_id, int):
+        raise ValueError('cursor inválido')
+    return data_criacao, simulado_id
+
+
+def _flag(value):
+    return None if value is None else int(bool(value))
+
+
+def _answer_rows(simulado_id, questoes_ids, details):
+    """Linhas de `simulado_answers`: do detalhamento por questão ou só dos ids"""
+    detailed = (details or {}).get('questions') if isinstance(details, dict) else None
+    if detailed:
+        return [
+            (
+                simulado_id, q.get('numero') or i, q.get('id'), q.get('bloco'),
+                q.get('gabarito'), q.get('resposta'), _flag(q.get('correta')), _flag(q.get('pulada')),
+            )
+            for i, q in enumerate(detailed, 1)
+        ]
+    return [
+        (simulado_id, i, qid, None, None, None, None, None)
+        for i, qid in enumerate(questoes_ids or [], 1)
+    ]
+
+
+def _details(answers):
+    """Reconstrói `details` ({questions, accuracies}) a partir das respostas gravadas"""
+    if not answers or all(a['correta'] is None for a in answers):
+        return None
+    accuracies = [0] * NUM_BLOCKS
+    questions = []
+    for a in answers:
+        bloco = a['bloco']
+        if a['correta'] and isinstance(bloco, int) and 1 <= bloco <= NUM_BLOCKS:
+            accuracies[bloco - 1] += 1
+        questions.append({
+            'id': a['questao_id'],
+            'bloco': bloco,
+            'numero': a['numero'],
+            'gabarito': a['gabarito'],
+            'resposta': a['resposta'],
+            'correta': bool(a['correta']),
+            'pulada': bool(a['pulada'])
+        })
+    return {'questions': questions, 'accuracies': accuracies}
+
+
+class SimuladoResults:
+    """Acesso aos resultados de simulados em tabelas normalizadas.
+
+    Cada resultado é uma linha de `simulados` (com `duration_seconds`
+    numérico), as provas ficam em `simulado_exams` e cada questão respondida
+    em `simulado_answers`. As leituras usam consultas indexadas em vez de
+    decodificar as colunas JSON antigas, mantidas apenas para resultados
+    gravados antes da migração.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.pool = get_pool(db_path)
+        self.create_tables()
+
+    def create_tables(self):
+        """Cria as tabelas normalizadas e migra os resultados antigos (uma vez)"""
+        conn = self.pool.get()
+        conn.executescript(RESULTS_SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(simulados)')}
+        if 'duration_seconds' in columns:
+            return
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Outro worker pode ter migrado enquanto esperávamos o lock
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(simulados)')}
+            if 'duration_seconds' not in columns:
+                conn.execute('ALTER TABLE simulados ADD COLUMN duration_seconds INTEGER')
+                self._migrate_legacy(conn)
+
+    def _migrate_legacy(self, conn):
+        rows = conn.execute('''
+            SELECT id, provas_selecionadas, questoes_ids, tempo_total, details FROM simulados
+        ''').fetchall()
+        for simulado_id, provas, questoes_ids, tempo_total, details in rows:
+            try:
+                details = json.loads(details) if details else None
+            except (TypeError, ValueError):
+                details = None
+            conn.execute(
+                'UPDATE simulados SET duration_seconds = ? WHERE id = ?',
+                (parse_duration(tempo_total), simulado_id),
+            )
+            self._insert_children(conn, simulado_id, _json_list(provas), _json_list(questoes_ids), details)
+        if rows:
+            print(f"🗂️ {len(rows)} simulados migrados para as tabelas normalizadas")
+
+    def _insert_children(self, conn, simulado_id, provas_selecionadas, questoes_ids, details):
+        conn.executemany(
+            'INSERT OR REPLACE INTO simulado_exams (simulado_id, posicao, fonte) VALUES (?, ?, ?)',
+            [(simulado_id, i, fonte) for i, fonte in enumerate(provas_selecionadas, 1)],
+        )
+        conn.executemany('''
+            INSERT OR REPLACE INTO simulado_answers
+            (simulado_id, numero, questao_id, bloco, gabarito, resposta, correta, pulada)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', _answer_rows(simulado_id, questoes_ids, details))
+
+    def save(self, conn, user_id, provas_selecionadas, num_questoes, questoes_ids,
+             tempo_total, acertos, erros, puladas, percentual, details=None):
+        """Grava um resultado (na transação de `conn`) e retorna o id"""
+        cursor = conn.execute('''
+            INSERT INTO simulados
+            (data_criacao, user_id, num_questoes, tempo_total, duration_seconds,
+             acertos, erros, puladas, percentual_acerto)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            datetime.now().isoformat(),
+            user_id,
+            num_questoes,
+            tempo_total,
+            parse_duration(tempo_total),
+            acertos,
+            erros,
+            puladas,
+            percentual
+        ))
+        simulado_id = cursor.lastrowid
+        self._insert_children(conn, simulado_id, list(provas_selecionadas or []), questoes_ids, details)
+        return simulado_id
+
+    def _load(self, where, params, suffix='', fields=None):
+        conn = self.pool.get()
+        rows = conn.execute(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM simulados {where} {suffix}", params
+        ).fetchall()
+        if not rows:
+            return []
+
+        fields = RESULT_FIELDS if fields is None else fields
+        ids = [row['id'] for row in rows]
+        placeholders = ','.join('?' * len(ids))
+        exams = {}
+        if 'provas_selecionadas' in fields:
+            for row in conn.execute(f'''
+                SELECT simulado_id, fonte FROM simulado_exams
+                WHERE simulado_id IN ({placeholders})
+                ORDER BY simulado_id, posicao
+            ''', ids):
+                exams.setdefault(row[0], []).append(row[1])
+        answers = {}
+        if 'questoes_ids' in fields or 'details' in fields:
+            for row in conn.execute(f'''
+                SELECT simulado_id, numero, questao_id, bloco, gabarito, resposta, correta, pulada
+                FROM simulado_answers
+                WHERE simulado_id IN ({placeholders})
+                ORDER BY simulado_id, numero
+            ''', ids):
+                answers.setdefault(row['simulado_id'], []).append(row)
+
+        results = []
+        for row in rows:
+            simulado_answers = answers.get(row['id'], [])
+            result = {
+                'id': row['id'],
+                'data_criacao': row['data_criacao'],
+                'user_id': row['user_id'],
+                'provas_selecionadas': exams.get(row['id'], []),
+                'num_questoes': row['num_questoes'],
+                'questoes_ids': [a['questao_id'] for a in simulado_answers],
+                'tempo_total': row['tempo_total'],
+                'acertos': row['acertos'],
+                'erros': row['erros'],
+                'puladas': row['puladas'],
+                'percentual_acerto': row['percentual_acerto'],
+                'details': _details(simulado_answers) if 'details' in fields else None
+            }
+            if fields is not RESULT_FIELDS:
+                result = {key: value for key, value in result.items() if key in fields}
+            results.append(result)
+        return results
+
+    def history(self, user_id=None, limit=HISTORY_PAGE_SIZE, cursor=None, fields=None,
+                since=None, until=None, fonte=None):
+        """Página do histórico, mais recentes primeiro (paginação por chave).
+
+        A ordem é (data_criacao, id) decrescente; `cursor` é o valor devolvido
+        na página anterior e cada página custa uma busca no índice, não
+        importa quantos simulados o usuário já fez. `since`/`until` filtram
+        `data_criacao` (ISO, `until` exclusivo), `fonte` restringe a
+        simulados que incluíram a prova e `fields` limita os campos
+        retornados. Retorna (resultados, próximo cursor ou None).
+        """
+        conditions = []
+        params = []
+        if user_id:
+            conditions.append('user_id = ?')
+            params.append(user_id)
+        if since:
+            conditions.append('data_criacao >= ?')
+            params.append(since)
+        if until:
+            conditions.append('data_criacao < ?')
+            params.append(until)
+        if fonte:
+            conditions.append('id IN (SELECT simulado_id FROM simulado_exams WHERE fonte = ?)')
+            params.append(fonte)
+        if cursor:
+            conditions.append('(data_criacao, id) < (?, ?)')
+            params.extend(decode_cursor(cursor))
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        limit = max(1, min(int(limit), MAX_HISTORY_PAGE_SIZE))
+
+        # Uma linha a mais indica se existe próxima página
+        results = self._load(
+            where, params + [limit + 1], 'ORDER BY data_criacao DESC, id DESC LIMIT ?',
+            fields=None if fields is None else set(fields) | {'id', 'data_criacao'},
+        )
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = encode_cursor(results[-1]['data_criacao'], results[-1]['id'])
+        if fields is not None:
+            results = [{key: value for key, value in r.items() if key in fields} for r in results]
+        return results, next_cursor
+
+    def get(self, simulado_id, user_id=None, fields=None):
+        """Um resultado por id (opcionalmente restrito ao usuário) ou None"""
+        fields = None if fields is None else set(fields)
+        if user_id:
+            results = self._load('WHERE id = ? AND user_id = ?', (simulado_id, user_id), fields=fields)
+        else:
+            results = self._load('WHERE id = ?', (simulado_id,), fields=fields)
+        return results[0] if results else None
@@ -0,0 +1,123 @@
+from db_pool import DB_PATH, get_pool
+
+
+def parse_duration(tempo):
+    """Converte "HH:MM:SS" ou "MM:SS" em segundos (None se inválido)"""
+    if not tempo or ':' not in tempo:
+        return None
+    try:
+        parts = [int(part) for part in tempo.split(':')]
+    except ValueError:
+        return None
+    if len(parts) == 3:
+        horas, minutos, segundos = parts
+        return horas * 3600 + minutos * 60 + segundos
+    if len(parts) == 2:
+        minutos, segundos = parts
+        return minutos * 60 + segundos
+    return None
+
+
+def format_duration(seconds):
+    """Formata segundos como "HH:MM:SS" """
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+class SimuladoStats:
+    """Contadores agregados dos simulados, atualizados na gravação de cada resultado.
+
+    `simulado_stats` tem uma única linha com os totais gerais e `exam_stats`
+    uma linha por prova; as leituras viram consultas de custo constante em
+    vez de agregações sobre todo o histórico. Na primeira execução os
+    contadores são preenchidos a partir da tabela `simulados`.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.pool = get_pool(db_path)
+        self.create_tables()
+
+    def create_tables(self):
+        """Cria as tabelas de estatísticas e faz o preenchimento inicial"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS simulado_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    total_simulados INTEGER NOT NULL DEFAULT 0,
+                    total_questoes INTEGER NOT NULL DEFAULT 0,
+                    soma_percentual REAL NOT NULL DEFAULT 0,
+                    melhor_percentual REAL NOT NULL DEFAULT 0,
+                    total_segundos INTEGER NOT NULL DEFAULT 0,
+                    tempos_validos INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS exam_stats (
+                    fonte TEXT PRIMARY KEY,
+                    uso_simulados INTEGER NOT NULL DEFAULT 0,
+                    total_segundos INTEGER NOT NULL DEFAULT 0,
+                    soma_percentual REAL NOT NULL DEFAULT 0,
+                    melhor_percentual REAL NOT NULL DEFAULT 0
+                )
+            ''')
+            # Só quem cria a linha de totais faz o preenchimento (uma vez por banco)
+            created = conn.execute('INSERT OR IGNORE INTO simulado_stats (id) VALUES (1)').rowcount
+            if created:
+                self._backfill(conn)
+
+    def _backfill(self, conn):
+        exams = {}
+        for simulado_id, fonte in conn.execute('SELECT simulado_id, fonte FROM simulado_exams'):
+            exams.setdefault(simulado_id, []).append(fonte)
+        rows = conn.execute('''
+            SELECT id, num_questoes, duration_seconds, percentual_acerto FROM simulados
+        ''').fetchall()
+        for simulado_id, num_questoes, seconds, percentual in rows:
+            self.record(conn, exams.get(simulado_id, []), num_questoes, seconds, percentual)
+        if rows:
+            print(f"📊 Estatísticas calculadas a partir de {len(rows)} simulados")
+
+    def rebuild(self, conn):
+        """Recalcula os contadores do zero (ex.: após recorrigir resultados)"""
+        conn.execute('DELETE FROM exam_stats')
+        conn.execute('DELETE FROM simulado_stats')
+        conn.execute('INSERT INTO simulado_stats (id) VALUES (1)')
+        self._backfill(conn)
+
+    def record(self, conn, provas_selecionadas, num_questoes, seconds, percentual):
+        """Soma um resultado aos contadores (na mesma transação da gravação)"""
+        percentual = percentual or 0
+        conn.execute('''
+            UPDATE simulado_stats SET
+                total_simulados = total_simulados + 1,
+                total_questoes = total_questoes + ?,
+                soma_percentual = soma_percentual + ?,
+                melhor_percentual = MAX(melhor_percentual, ?),
+                total_segundos = total_segundos + ?,
+                tempos_validos = tempos_validos + ?
+            WHERE id = 1
+        ''', (num_questoes or 0, percentual, percentual, seconds or 0, 0 if seconds is None else 1))
+        conn.executemany('''
+            INSERT INTO exam_stats (fonte, uso_simulados, total_segundos, soma_percentual, melhor_percentual)
+            VALUES (?, 1, ?, ?, ?)
+            ON CONFLICT (fonte) DO UPDATE SET
+                uso_simulados = uso_simulados + 1,
+                total_segundos = total_segundos + excluded.total_segundos,
+                soma_percentual = soma_percentual + excluded.soma_percentual,
+                melhor_percentual = MAX(melhor_percentual, excluded.melhor_percentual)
+        ''', [(fonte, seconds or 0, percentual, percentual) for fonte in dict.fromkeys(provas_selecionadas or [])])
+
+    def totals(self):
+        """Linha de totais gerais (dicionário)"""
+        row = self.pool.get().execute('SELECT * FROM simulado_stats WHERE id = 1').fetchone()
+        if row is None:
+            return {
+                'total_simulados': 0, 'total_questoes': 0, 'soma_percentual': 0,
+                'melhor_percentual': 0, 'total_segundos': 0, 'tempos_validos': 0,
+            }
+        return dict(row)
+
+    def exam_usage(self):
+        """Contadores por prova: {fonte: dicionário}"""
+        rows = self.pool.get().execute('SELECT * FROM exam_stats').fetchall()
+        return {row['fonte']: dict(row) for row in rows}
@@ -0,0 +1,71 @@
+import json
+import time
+
+from db_pool import DB_PATH, get_pool
+
+# Prova de 2 horas + margem; depois disso o simulado ativo é descartado
+ACTIVE_SIMULADO_TTL = 3 * 60 * 60
+
+
+class ActiveSimuladoStore:
+    """Guarda no servidor o simulado em andamento de cada usuário.
+
+    O cookie de sessão carrega apenas o `user_id`; aqui ficam somente os ids
+    das questões, os blocos, as provas selecionadas e o horário de início.
+    A tabela é compartilhada entre os workers e as entradas expiram após
+    `ttl` segundos (removidas sempre que um novo simulado é gravado).
+    """
+
+    def __init__(self, db_path=DB_PATH, ttl=ACTIVE_SIMULADO_TTL):
+        self.pool = get_pool(db_path)
+        self.ttl = ttl
+        self.create_table()
+
+    def create_table(self):
+        """Cria a tabela de simulados ativos"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS active_simulados (
+                    user_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_active_simulados_expires
+                ON active_simulados (expires_at)
+            ''')
+
+    def put(self, user_id, question_ids, blocos, selected_exams, start_time):
+        """Registra (ou substitui) o simulado ativo do usuário"""
+        payload = json.dumps({
+            'question_ids': list(question_ids),
+            'blocos': list(blocos),
+            'selected_exams': list(selected_exams),
+            'num_questoes': len(question_ids),
+            'start_time': start_time,
+        }, separators=(',', ':'))
+        now = time.time()
+        with self.pool.connection() as conn:
+            conn.execute('DELETE FROM active_simulados WHERE expires_at <= ?', (now,))
+            conn.execute(
+                'INSERT OR REPLACE INTO active_simulados (user_id, payload, expires_at) VALUES (?, ?, ?)',
+                (user_id, payload, now + self.ttl),
+            )
+
+    def get(self, user_id):
+        """Retorna o simulado ativo do usuário ou None se não houver/expirou"""
+        if not user_id:
+            return None
+        row = self.pool.get().execute(
+            'SELECT payload FROM active_simulados WHERE user_id = ? AND expires_at > ?',
+            (user_id, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pop(self, user_id):
+        """Remove o simulado ativo do usuário"""
+        if not user_id:
+            return
+        with self.pool.connection() as conn:
+            conn.execute('DELETE FROM active_simulados WHERE user_id = ?', (user_id,))
@@ -1,59 +1,55 @@
-import sqlite3
 import json
-import random
-from datetime import datetime
+import threading
+
+from db_pool import get_pool
+from exam_sampler import BLOCK_STRUCTURE, assign_block, sample_exam
+from migrations import migrate
+from question_catalog import get_catalog, is_valid_question
+from simulado_results import SimuladoResults
+from simulado_stats import SimuladoStats, format_duration, parse_duration
+from user_analytics import UserAnalytics
 
 class SimuladosSystemV2Improved:
     def __init__(self, db_path='questions.db'):
         self.db_path = db_path
+        self.pool = get_pool(db_path)
+        self.catalog = get_catalog(db_path)
         self.create_simulados_table()
+        self.results = SimuladoResults(db_path)
+        self.stats = SimuladoStats(db_path)
+        self.analytics = UserAnalytics(db_path)
+        migrate(self.pool.get())
     
     def create_simulados_table(self):
         """Cria tabela para armazenar simulados realizados"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS simulados (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id TEXT,
-                provas_selecionadas TEXT,
-                num_questoes INTEGER,
-                questoes_ids TEXT,
-                tempo_total TEXT,
-                acertos INTEGER,
-                erros INTEGER,
-                puladas INTEGER,
-                percentual_acerto REAL,
-                details TEXT
-            )
-        ''')
-        # Migrações leves: garantir colunas novas
-        try:
-            cursor.execute('ALTER TABLE simulados ADD COLUMN details TEXT')
-        except Exception:
-            pass
-        try:
-            cursor.execute('ALTER TABLE simulados ADD COLUMN user_id TEXT')
-        except Exception:
-            pass
-        conn.commit()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS simulados (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    user_id TEXT,
+                    provas_selecionadas TEXT,
+                    num_questoes INTEGER,
+                    questoes_ids TEXT,
+                    tempo_total TEXT,
+                    acertos INTEGER,
+                    erros INTEGER,
+                    puladas INTEGER,
+                    percentual_acerto REAL,
+                    details TEXT
+                )
+            ''')
+            # Migrações leves: garantir colunas novas (só altera a tabela se faltarem)
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(simulados)')}
+            for column in ('details', 'user_id'):
+                if column not in columns:
+                    cursor.execute(f'ALTER TABLE simulados ADD COLUMN {column} TEXT')
     
     def get_available_exams(self):
-        """Retorna lista de provas disponíveis no banco"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT fonte, COUNT(*) as total_questoes
-            FROM questoes 
-            GROUP BY fonte
-            ORDER BY fonte DESC
-        ''')
-        
-        exams_data = cursor.fetchall()
-        conn.close()
+        """Retorna lista de provas disponíveis (a partir do catálogo em memória)"""
+        catalog = self.catalog.snapshot()
+        exams_data = [(fonte, len(catalog.ids_for(fonte))) for fonte in sorted(catalog.by_fonte, reverse=True)]
         
         exam_mapping = {
             'Processo Seletivo 2025': 'Processo Seletivo 2025',
@@ -85,393 +81,113 @@ class SimuladosSystemV2Improved:
             num_questions: Total de questões (padrão: 24)
             exam_distribution: Dicionário com distribuição por prova (ex: {'2024': 16, '2023': 8})
         """
+        catalog = self.catalog.snapshot()
         
-        # Estrutura fixa dos blocos conforme especificação
-        BLOCK_STRUCTURE = {
-            'bloco_1': 8,   # 8 questões
-            'bloco_2': 6,   # 6 questões  
-            'bloco_3': 6,   # 6 questões
-            'bloco_4': 4    # 4 questões
-        }
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if exam_distribution:
-            # Modo personalizado: distribuição específica por prova
-            print(f"🎯 Criando simulado com distribuição personalizada: {exam_distribution}")
-            
-            all_questions = []
-            selected_ids = set()
-            current_block = 1
-            questions_in_current_block = 0
-            
-            for exam_id, num_questions_from_exam in exam_distribution.items():
-                if num_questions_from_exam <= 0:
-                    continue
-                    
-                print(f"   📚 Selecionando {num_questions_from_exam} questões de {exam_id}")
-                
-                # Buscar questões da prova específica
-                cursor.execute('''
-                    SELECT id, enunciado, a, b, c, d, e, gabarito, fonte, imagens
-                    FROM questoes 
-                    WHERE fonte = ?
-                    ORDER BY RANDOM()
-                    LIMIT ?
-                ''', (exam_id, num_questions_from_exam * 2))  # Buscar mais para ter opções
-                
-                exam_questions = cursor.fetchall()
-                
-                # Selecionar questões únicas
-                questions_selected = 0
-                for q in exam_questions:
-                    if questions_selected >= num_questions_from_exam:
-                        break
-                        
-                    if q[0] not in selected_ids and self._is_valid_question(q):
-                        selected_ids.add(q[0])
-                        
-                        # Atribuir bloco baseado na estrutura dos blocos
-                        if questions_in_current_block >= BLOCK_STRUCTURE[f'bloco_{current_block}']:
-                            current_block += 1
-                            questions_in_current_block = 0
-                        
-                        all_questions.append({
-                            'id': q[0],
-                            'enunciado': q[1] or f"Questão {q[0]}",
-                            'a': q[2] or '',
-                            'b': q[3] or '',
-                            'c': q[4] or '',
-                            'd': q[5] or '',
-                            'e': q[6] or '',
-                            'gabarito': q[7] or '?',
-                            'fonte': q[8],
-                            'imagens': '[]',  # Não retornar imagens grandes na criação
-                            'bloco': current_block
-                        })
-                        
-                        questions_in_current_block += 1
-                        questions_selected += 1
-                
-                print(f"      ✅ {questions_selected} questões selecionadas de {exam_id}")
-                
-        else:
-            # Modo aleatório tradicional
-            print(f"🎲 Criando simulado com seleção aleatória")
-            
-            # Buscar questões das provas selecionadas
-            placeholders = ','.join(['?' for _ in selected_exams])
-            
-            cursor.execute(f'''
-                SELECT id, enunciado, a, b, c, d, e, gabarito, fonte, imagens
-                FROM questoes 
-                WHERE fonte IN ({placeholders})
-                ORDER BY RANDOM()
-            ''', selected_exams)
-            
-            all_questions_raw = cursor.fetchall()
-            
-            if len(all_questions_raw) < num_questions:
-                print(f"⚠️  Aviso: Apenas {len(all_questions_raw)} questões disponíveis, mas são necessárias {num_questions}")
-                return []
-            
-            # Conjunto para controlar IDs já selecionados (evita duplicatas)
-            selected_ids = set()
-            all_questions = []
-            
-            # Selecionar questões únicas para cada bloco
-            for block_num, block_size in enumerate(BLOCK_STRUCTURE.values(), 1):
-                block_questions = []
-                attempts = 0
-                max_attempts = len(all_questions_raw) * 2  # Evita loop infinito
-                
-                while len(block_questions) < block_size and attempts < max_attempts:
-                    attempts += 1
-                    
-                    # Encontrar questão não selecionada
-                    for q in all_questions_raw:
-                        if q[0] not in selected_ids and len(block_questions) < block_size:
-                            # Verificar se a questão tem alternativas válidas
-                            if self._is_valid_question(q):
-                                selected_ids.add(q[0])
-                                block_questions.append({
-                                    'id': q[0],
-                                    'enunciado': q[1] or f"Questão {q[0]}",
-                                    'a': q[2] or '',
-                                    'b': q[3] or '',
-                                    'c': q[4] or '',
-                                    'd': q[5] or '',
-                                    'e': q[6] or '',
-                                    'gabarito': q[7] or '?',
-                                    'fonte': q[8],
-                                    'imagens': '[]',  # Não retornar imagens grandes na criação
-                                    'bloco': block_num
-                                })
-                                break
-                    
-                    # Se não encontrou questão válida, parar
-                    if len(block_questions) == 0:
-                        break
-                
-                # Adicionar questões do bloco à lista principal
-                all_questions.extend(block_questions)
-                
-                print(f"✅ Bloco {block_num}: {len(block_questions)} questões selecionadas")
-        
-        conn.close()
+        # Sorteio sobre os ids válidos pré-calculados por prova (sem tocar no banco)
+        picked = sample_exam(catalog, selected_exams, num_questions, exam_distribution)
+        all_questions = [self._exam_question(catalog.get(qid), bloco) for qid, bloco in picked]
         
         # Verificar se conseguimos o número de questões solicitado
         if len(all_questions) < num_questions:
             print(f"⚠️  Apenas {len(all_questions)} questões válidas encontradas")
-            return all_questions
         
-        # Garantir exatamente o número de questões solicitado
-        return all_questions[:num_questions]
+        return all_questions
     
-    def _assign_block(self, question_index, block_structure):
+    def _assign_block(self, question_index, block_structure=BLOCK_STRUCTURE):
         """Atribui cada questão ao bloco correto baseado no índice"""
-        if question_index < block_structure['bloco_1']:
-            return 1
-        elif question_index < (block_structure['bloco_1'] + block_structure['bloco_2']):
-            return 2
-        elif question_index < (block_structure['bloco_1'] + block_structure['bloco_2'] + block_structure['bloco_3']):
-            return 3
-        else:
-            return 4
+        return assign_block(question_index, block_structure)
+    
+    def _exam_question(self, q, bloco):
+        """Monta o dicionário de uma questão do simulado a partir do catálogo"""
+        return {
+            'id': q['id'],
+            'enunciado': q.get('enunciado') or f"Questão {q['id']}",
+            'a': q['a'] or '',
+            'b': q['b'] or '',
+            'c': q['c'] or '',
+            'd': q['d'] or '',
+            'e': q['e'] or '',
+            'gabarito': q['gabarito'] or '?',
+            'fonte': q['fonte'],
+            'imagens': '[]',  # Não retornar imagens grandes na criação
+            'bloco': bloco
+        }
     
     def _is_valid_question(self, question):
         """Verifica se uma questão é válida para o simulado"""
-        # Verificar se tem pelo menos algumas alternativas
-        alternatives = [question[2], question[3], question[4], question[5], question[6]]  # a, b, c, d, e
-        valid_alternatives = [alt for alt in alternatives if alt and alt.strip()]
-        
-        # Questão é válida se tem pelo menos 3 alternativas
-        # Temporariamente aceitamos gabarito "?" devido a problemas de dados
-        return len(valid_alternatives) >= 3
+        return is_valid_question(question)
     
     def save_simulado_result(self, provas_selecionadas, num_questoes, questoes_ids, 
                            tempo_total, acertos, erros, puladas, details=None, user_id=None):
         """Salva resultado de um simulado realizado"""
         percentual = (acertos / num_questoes) * 100 if num_questoes > 0 else 0
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO simulados 
-            (data_criacao, user_id, provas_selecionadas, num_questoes, questoes_ids, tempo_total, 
-             acertos, erros, puladas, percentual_acerto, details)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.now().isoformat(),
-            user_id,
-            json.dumps(provas_selecionadas),
-            num_questoes,
-            json.dumps(questoes_ids),
-            tempo_total,
-            acertos,
-            erros,
-            puladas,
-            percentual,
-            json.dumps(details) if details is not None else None
-        ))
-        
-        simulado_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.pool.connection() as conn:
+            simulado_id = self.results.save(
+                conn, user_id, provas_selecionadas, num_questoes, questoes_ids,
+                tempo_total, acertos, erros, puladas, percentual, details
+            )
+            seconds = parse_duration(tempo_total)
+            self.stats.record(conn, provas_selecionadas, num_questoes, seconds, percentual)
+            self.analytics.record(conn, user_id, num_questoes, acertos, seconds, details)
         
         return simulado_id
     
     def get_simulados_history(self, user_id=None):
         """Retorna histórico de simulados realizados"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        base_select = '''
-            SELECT 
-                id,
-                data_criacao,
-                user_id,
-                provas_selecionadas,
-                num_questoes,
-                questoes_ids,
-                tempo_total,
-                acertos,
-                erros,
-                puladas,
-                percentual_acerto,
-                details
-            FROM simulados
-        '''
-        if user_id:
-            cursor.execute(base_select + ' WHERE user_id = ? ORDER BY data_criacao DESC LIMIT 50', (user_id,))
-        else:
-            cursor.execute(base_select + ' ORDER BY data_criacao DESC LIMIT 50')
-        
-        simulados = []
-        for row in cursor.fetchall():
-            simulado = {
-                'id': row[0],
-                'data_criacao': row[1],
-                'user_id': row[2],
-                'provas_selecionadas': json.loads(row[3]) if row[3] else [],
-                'num_questoes': row[4],
-                'questoes_ids': json.loads(row[5]) if row[5] else [],
-                'tempo_total': row[6],
-                'acertos': row[7],
-                'erros': row[8],
-                'puladas': row[9],
-                'percentual_acerto': row[10],
-                'details': json.loads(row[11]) if row[11] else None
-            }
-            simulados.append(simulado)
+        return self.results.history(user_id=user_id)[0]
+    
+    def get_simulados_history_page(self, user_id=None, **filters):
+        """Página do histórico com cursor: (simulados, próximo cursor ou None)
         
-        conn.close()
-        return simulados
+        Filtros aceitos: limit, cursor, fields, since, until, fonte.
+        """
+        return self.results.history(user_id=user_id, **filters)
     
-    def get_simulado_by_id(self, simulado_id, user_id=None):
+    def get_simulado_by_id(self, simulado_id, user_id=None, fields=None):
         """Retorna um simulado específico por ID (opcionalmente filtrando por user_id)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        base_select = '''
-            SELECT 
-                id,
-                data_criacao,
-                user_id,
-                provas_selecionadas,
-                num_questoes,
-                questoes_ids,
-                tempo_total,
-                acertos,
-                erros,
-                puladas,
-                percentual_acerto,
-                details
-            FROM simulados
-            WHERE id = ?
-        '''
-        if user_id:
-            cursor.execute(base_select + ' AND user_id = ?', (simulado_id, user_id))
-        else:
-            cursor.execute(base_select, (simulado_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {
-                'id': row[0],
-                'data_criacao': row[1],
-                'user_id': row[2],
-                'provas_selecionadas': json.loads(row[3]) if row[3] else [],
-                'num_questoes': row[4],
-                'questoes_ids': json.loads(row[5]) if row[5] else [],
-                'tempo_total': row[6],
-                'acertos': row[7],
-                'erros': row[8],
-                'puladas': row[9],
-                'percentual_acerto': row[10],
-                'details': json.loads(row[11]) if row[11] else None
-            }
-        return None
+        return self.results.get(simulado_id, user_id=user_id, fields=fields)
     
     def get_statistics(self):
-        """Retorna estatísticas gerais dos simulados"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Retorna estatísticas gerais dos simulados (contadores mantidos na gravação)"""
+        totals = self.stats.totals()
+        total_simulados = totals['total_simulados']
         
-        cursor.execute('SELECT COUNT(*) FROM simulados')
-        total_simulados = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT AVG(percentual_acerto) FROM simulados')
-        media_acertos = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT MAX(percentual_acerto) FROM simulados')
-        melhor_resultado = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT SUM(num_questoes) FROM simulados')
-        total_questoes = cursor.fetchone()[0] or 0
-        
-        # Calcular tempo médio
-        cursor.execute('SELECT tempo_total FROM simulados WHERE tempo_total IS NOT NULL AND tempo_total != ""')
-        tempos = cursor.fetchall()
+        media_acertos = totals['soma_percentual'] / total_simulados if total_simulados else 0
         
         tempo_medio = "00:00:00"
-        if tempos:
-            try:
-                # Converter tempos para segundos e calcular média
-                total_segundos = 0
-                tempos_validos = 0
-                
-                for tempo_row in tempos:
-                    tempo_str = tempo_row[0]
-                    if tempo_str and ':' in tempo_str:
-                        # Formato esperado: HH:MM:SS ou MM:SS
-                        parts = tempo_str.split(':')
-                        if len(parts) == 3:  # HH:MM:SS
-                            horas, minutos, segundos = map(int, parts)
-                            segundos_total = horas * 3600 + minutos * 60 + segundos
-                        elif len(parts) == 2:  # MM:SS
-                            minutos, segundos = map(int, parts)
-                            segundos_total = minutos * 60 + segundos
-                        else:
-                            continue
-                        
-                        total_segundos += segundos_total
-                        tempos_validos += 1
-                
-                if tempos_validos > 0:
-                    media_segundos = total_segundos / tempos_validos
-                    horas = int(media_segundos // 3600)
-                    minutos = int((media_segundos % 3600) // 60)
-                    segundos = int(media_segundos % 60)
-                    tempo_medio = f"{horas:02d}:{minutos:02d}:{segundos:02d}"
-                    
-            except Exception as e:
-                print(f"Erro ao calcular tempo médio: {e}")
-                tempo_medio = "00:00:00"
-        
-        conn.close()
+        if totals['tempos_validos']:
+            tempo_medio = format_duration(totals['total_segundos'] / totals['tempos_validos'])
         
         return {
             'total_simulados': total_simulados,
             'media_acertos': round(media_acertos, 2),
-            'melhor_resultado': round(melhor_resultado, 2),
-            'total_questoes': total_questoes,
+            'melhor_resultado': round(totals['melhor_percentual'], 2),
+            'total_questoes': totals['total_questoes'],
             'tempo_medio': tempo_medio
         }
     
+    def get_user_analytics(self, user_id):
+        """Resumo de desempenho do usuário (agregados mantidos na gravação)"""
+        return self.analytics.summary(user_id)
+    
+    def get_exam_statistics_version(self):
+        """Versão dos dados de get_exam_statistics: muda a cada importação ou simulado gravado"""
+        return (self.catalog.snapshot().version, self.stats.totals()['total_simulados'])
+    
     def get_exam_statistics(self):
         """Retorna estatísticas por prova específica"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT fonte, COUNT(*) as total_questoes
-            FROM questoes 
-            GROUP BY fonte
-        ''')
+        catalog = self.catalog.snapshot()
+        usage = self.stats.exam_usage()
         
         exam_stats = []
-        for row in cursor.fetchall():
-            fonte = row[0]
-            total_questoes = row[1]
-            
-            # Buscar simulados que usaram esta prova
-            cursor.execute('''
-                SELECT COUNT(*) as uso_simulados
-                FROM simulados 
-                WHERE provas_selecionadas LIKE ?
-            ''', (f'%{fonte}%',))
-            
-            uso_simulados = cursor.fetchone()[0]
-            
+        for fonte in sorted(catalog.by_fonte):
             exam_stats.append({
                 'fonte': fonte,
-                'total_questoes': total_questoes,
-                'uso_simulados': uso_simulados
+                'total_questoes': len(catalog.ids_for(fonte)),
+                'uso_simulados': usage.get(fonte, {}).get('uso_simulados', 0)
             })
         
-        conn.close()
         return exam_stats
     
     def verify_no_duplicates(self, questoes_ids):
@@ -499,5 +215,21 @@ class SimuladosSystemV2Improved:
         
         return not has_duplicates
 
-# Instância global do sistema melhorado
-simulados_system_v2_improved = SimuladosSystemV2Improved()
+_systems = {}
+_systems_lock = threading.Lock()
+
+
+def get_system(db_path='questions.db'):
+    """Retorna o sistema compartilhado para o banco informado.
+
+    O esquema é preparado na primeira chamada de cada processo, não na
+    importação do módulo.
+    """
+    pool = get_pool(db_path)
+    system = _systems.get(pool)
+    if system is None:
+        with _systems_lock:
+            system = _systems.get(pool)
+            if system is None:
+                system = _systems[pool] = SimuladosSystemV2Improved(db_path)
+    return system
@@ -346,30 +346,13 @@ function updateQuestionNavigation() {
             elements.questionText.innerHTML = q.enunciado;
         }
 
-        // Buscar imagens da questão usando a API correta
-        if (q.id) {
+        // Imagens já vêm junto com as questões do simulado (/api/simulados/current)
+        if (q.imagens && q.imagens !== '[]') {
             try {
-                const imageResponse = await fetch(`/api/simulados/question/${q.id}`);
-                if (imageResponse.ok) {
-                    const questionData = await imageResponse.json();
-                    
-                    if (questionData.imagens && questionData.imagens !== '[]') {
-                        try {
-                            const images = JSON.parse(questionData.imagens);
-                            displayQuestionImages(images);
-                        } catch (e) {
-                            console.error('Erro ao processar imagens:', e);
-                            if (elements.questionImages) elements.questionImages.innerHTML = '';
-                        }
-                    } else {
-                        if (elements.questionImages) elements.questionImages.innerHTML = '';
-                    }
-                } else {
-                    console.error('Erro ao buscar questão:', imageResponse.status);
-                    if (elements.questionImages) elements.questionImages.innerHTML = '';
-                }
+                const images = typeof q.imagens === 'string' ? JSON.parse(q.imagens) : q.imagens;
+                displayQuestionImages(images);
             } catch (e) {
-                console.error('Erro ao buscar imagens:', e);
+                console.error('Erro ao processar imagens:', e);
                 if (elements.questionImages) elements.questionImages.innerHTML = '';
             }
         } else {
@@ -930,6 +913,15 @@ function updateQuestionNavigation() {
         await displayQuestion(currentQuestionIndex);
     }
 
+    // Imagens de questão passam pela rota /img/, que escolhe formato e largura
+    function responsiveImageSrc(path) {
+        const normalized = path.replace(/\\/g, '/').replace(/^\//, '');
+        if (!/^\d{4}_questions_imgs\//.test(normalized)) return `/${normalized}`;
+        const width = Math.round(Math.min(window.innerWidth, 1200));
+        const dpr = window.devicePixelRatio || 1;
+        return `/img/${normalized}?w=${width}&dpr=${dpr}`;
+    }
+
     // Funções para exibir imagens
     function displayQuestionImages(images) {
         if (!elements.questionImages) {
@@ -955,11 +947,9 @@ function updateQuestionNavigation() {
 
             // Suporta novo formato por path/url e legado base64
             if (typeof image === 'string') {
-                const normalized = image.replace(/\\/g, '/');
-                img.src = normalized.startsWith('/') ? normalized : `/${normalized}`;
+                img.src = responsiveImageSrc(image);
             } else if (image && (image.path || image.url)) {
-                const p = (image.path || image.url).replace(/\\/g, '/');
-                img.src = p.startsWith('/') ? p : `/${p}`;
+                img.src = responsiveImageSrc(image.path || image.url);
             } else {
                 const base64Data = image?.data || image?.base64;
                 if (!base64Data || typeof base64Data !== 'string') {
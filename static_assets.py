@@ -0,0 +1,222 @@
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+import threading
+
+from flask import abort, request, send_from_directory
+from werkzeug.security import safe_join
+
+from compression import SUFFIXES, is_compressible, negotiate, precompressed_siblings
+from image_variants import IMG_DIRS, pick_variant, requested_width
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Pastas servidas como assets (caminhos gravados em `questoes` começam por elas)
+ASSET_DIRS = (
+    '2022_questions_imgs',
+    '2023_questions_imgs',
+    '2024_questions_imgs',
+    '2025_questions_imgs',
+    'questions_alts',
+    'simulados',
+    'static',
+)
+
+# URLs com fingerprint nunca mudam de conteúdo: cache de 1 ano
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+FINGERPRINT_LENGTH = 12
+
+# Cabeçalhos que mudam a variante escolhida em /img/
+IMAGE_VARY_HEADERS = ('Accept', 'Save-Data', 'Sec-CH-Width', 'Width', 'Sec-CH-DPR', 'DPR')
+
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+
+# questao_1.3f2a9c1d4e5b.webp -> (questao_1, 3f2a9c1d4e5b, .webp)
+_FINGERPRINT_RE = re.compile(
+    r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$' % FINGERPRINT_LENGTH
+)
+
+
+class AssetFingerprints:
+    """Calcula (e guarda em cache) o hash de conteúdo dos arquivos servidos.
+
+    O hash é recalculado apenas quando o mtime ou o tamanho do arquivo
+    mudam, então cada arquivo é lido uma única vez por processo.
+    """
+
+    def __init__(self, base_dir=BASE_DIR):
+        self.base_dir = base_dir
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def digest(self, rel_path):
+        """Hash de conteúdo do arquivo (relativo à raiz do projeto) ou None"""
+        path = os.path.join(self.base_dir, rel_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        digest = h.hexdigest()[:FINGERPRINT_LENGTH]
+        with self._lock:
+            self._cache[path] = (key, digest)
+        return digest
+
+    def export(self):
+        """Hashes já calculados: {caminho relativo: [mtime_ns, tamanho, hash]}"""
+        with self._lock:
+            return {
+                os.path.relpath(path, self.base_dir): [key[0], key[1], digest]
+                for path, (key, digest) in self._cache.items()
+            }
+
+    def preload(self, entries):
+        """Semeia o cache com hashes salvos (ex.: snapshot de inicialização).
+
+        Cada hash só é reaproveitado enquanto o mtime e o tamanho do arquivo
+        continuarem iguais aos salvos; senão o arquivo é lido de novo.
+        """
+        with self._lock:
+            for rel_path, (mtime_ns, size, digest) in entries.items():
+                path = os.path.join(self.base_dir, rel_path)
+                self._cache.setdefault(path, ((mtime_ns, size), digest))
+
+    def url(self, rel_path):
+        """Insere o hash no nome do arquivo: dir/questao_1.webp -> dir/questao_1.<hash>.webp
+
+        Caminhos fora de ASSET_DIRS ou de arquivos inexistentes são
+        devolvidos sem alteração.
+        """
+        if not isinstance(rel_path, str):
+            return rel_path
+        normalized = rel_path.replace('\\', '/')
+        leading = '/' if normalized.startswith('/') else ''
+        normalized = normalized.lstrip('/')
+        if normalized.split('/', 1)[0] not in ASSET_DIRS:
+            return rel_path
+        digest = self.digest(normalized)
+        if digest is None:
+            return rel_path
+        stem, ext = os.path.splitext(normalized)
+        return f"{leading}{stem}.{digest}{ext}"
+
+    def resolve(self, subdir, filename):
+        """Separa o fingerprint do nome pedido: retorna (arquivo_real, hash_pedido)"""
+        match = _FINGERPRINT_RE.match(filename)
+        if match and not os.path.exists(os.path.join(self.base_dir, subdir, filename)):
+            return match.group('stem') + match.group('ext'), match.group('digest')
+        return filename, None
+
+
+fingerprints = AssetFingerprints()
+
+
+def asset_url(rel_path):
+    """Caminho com fingerprint de um asset (para templates e respostas da API)"""
+    return fingerprints.url(rel_path)
+
+
+def send_asset(subdir, filename):
+    """Serve um arquivo de `subdir` com ETag forte e cache conforme o fingerprint.
+
+    - nome com fingerprint atual: `Cache-Control: public, max-age=1 ano, immutable`
+    - sem fingerprint (ou desatualizado): `no-cache`, revalidado via ETag (304)
+    """
+    safe_filename = filename.replace('\\', '/').lstrip('/')
+    directory = os.path.join(fingerprints.base_dir, subdir)
+    if safe_join(directory, safe_filename) is None:
+        abort(404)
+    real_filename, requested_digest = fingerprints.resolve(subdir, safe_filename)
+    digest = fingerprints.digest(os.path.join(subdir, real_filename))
+    if digest is None:
+        # Arquivo inexistente (ou caminho inválido): deixa o Flask responder 404
+        return send_from_directory(directory, real_filename)
+
+    return send_with_digest(directory, real_filename, digest, requested_digest == digest)
+
+
+def send_with_digest(directory, filename, digest, immutable):
+    """Envia o arquivo com o hash como ETag forte; `immutable` libera cache longo.
+
+    Arquivos de texto com irmão pré-comprimido atualizado (.br/.gz, gerados
+    no build) são enviados na melhor codificação aceita pelo cliente.
+    """
+    compressible = is_compressible(filename)
+    encoding = None
+    if compressible:
+        siblings = precompressed_siblings(os.path.join(directory, filename))
+        if siblings:
+            encoding = negotiate(request.accept_encodings, siblings)
+    max_age = IMMUTABLE_MAX_AGE if immutable else 0
+    if encoding:
+        response = send_from_directory(
+            directory,
+            filename + SUFFIXES[encoding],
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            etag=f"{digest}-{encoding}",
+            max_age=max_age,
+        )
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(directory, filename, etag=digest, max_age=max_age)
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+def send_image_variant(filename):
+    """Serve a variante responsiva de uma imagem de questão (/img/<pasta>/<arquivo>).
+
+    A variante é escolhida por `Accept` (AVIF/WebP), largura pedida (?w= e
+    ?dpr= ou client hints) e Save-Data; sem variante adequada, o original
+    é enviado. O cache só é imutável quando uma variante é servida e o
+    fingerprint pedido é o do original; o original enviado no lugar de uma
+    variante (variantes ainda não geradas) é sempre revalidado, para que a
+    mesma URL passe a receber a variante quando ela existir.
+    """
+    safe_filename = filename.replace('\\', '/').lstrip('/')
+    subdir, _, name = safe_filename.partition('/')
+    directory = os.path.join(fingerprints.base_dir, subdir)
+    if subdir not in IMG_DIRS or not name or safe_join(directory, name) is None:
+        abort(404)
+    real_name, requested_digest = fingerprints.resolve(subdir, name)
+    original = f"{subdir}/{real_name}"
+    original_digest = fingerprints.digest(original)
+    if original_digest is None:
+        abort(404)
+
+    save_data = request.headers.get('Save-Data', '').lower() == 'on' or request.args.get('q') == 'low'
+    variant = pick_variant(
+        original,
+        request.headers.get('Accept'),
+        requested_width(request.args, request.headers),
+        save_data,
+        base_dir=fingerprints.base_dir,
+    )
+    target = variant or original
+    target_dir, target_name = os.path.split(target)
+    response = send_with_digest(
+        os.path.join(fingerprints.base_dir, target_dir),
+        target_name,
+        fingerprints.digest(target),
+        variant is not None and requested_digest == original_digest,
+    )
+    if variant is None:
+        response.cache_control.no_cache = True
+    response.vary.update(IMAGE_VARY_HEADERS)
+    response.headers['Accept-CH'] = 'Sec-CH-Width, Sec-CH-DPR, Width, DPR'
+    return response
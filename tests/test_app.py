@@ -0,0 +1,14 @@
+from app import create_app
+
+
+def test_create_app_on_empty_db(tmp_path):
+    """O app sobe em um banco novo, sem a tabela `questoes`"""
+    app = create_app(str(tmp_path / 'empty.db'))
+    client = app.test_client()
+
+    assert client.get('/').status_code == 200
+    response = client.get('/api/exams/available')
+    assert response.status_code == 200
+    assert response.get_json() == []
+    assert client.get('/api/simulados/analytics').status_code == 200
+    assert client.get('/api/simulados/history').get_json() == []
@@ -0,0 +1,30 @@
+import pytest
+
+import metrics
+from app import create_app
+
+
+@pytest.fixture
+def client(tmp_path):
+    return create_app(str(tmp_path / 'metrics.db')).test_client()
+
+
+def test_metrics_local_only_without_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', None)
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'simulados_sql_queries_total' in response.get_data(as_text=True)
+
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 404
+    assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.7'}).status_code == 404
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 's3cr3t')
+    remote = {'REMOTE_ADDR': '10.0.0.5'}
+
+    assert client.get('/metrics', environ_base=remote).status_code == 401
+    assert client.get('/metrics', environ_base=remote, headers={'Authorization': 'Bearer é'}).status_code == 401
+    ok = client.get('/metrics', environ_base=remote, headers={'Authorization': 'Bearer s3cr3t'})
+    assert ok.status_code == 200
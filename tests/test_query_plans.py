@@ -0,0 +1,18 @@
+import os
+import shutil
+
+import check_query_plans
+
+
+def test_no_full_table_scans(tmp_path, monkeypatch):
+    """Nenhuma consulta do app ou do ada.py faz varredura completa de tabela"""
+    shutil.copy(
+        os.path.join(check_query_plans.BASE_DIR, check_query_plans.DB_FILE),
+        tmp_path / check_query_plans.DB_FILE,
+    )
+    monkeypatch.chdir(tmp_path)
+
+    checked, failures = check_query_plans.find_table_scans()
+
+    assert checked > 0
+    assert failures == [], '\n'.join(f"{sql}\n  -> {'; '.join(scans)}" for sql, scans in failures)
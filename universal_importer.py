@@ -1,9 +1,16 @@
 import sqlite3
 import json
 import os
+import time
+from itertools import islice
+
+from catalog_schema import CATALOG_TRIGGERS
 
 DB_PATH = 'questions.db'
 
+# Questões por executemany na importação em massa
+BATCH_SIZE = 500
+
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
@@ -26,25 +33,9 @@ def init_db():
     conn.close()
 
 
-def import_questions(questions, fonte="Importação"):
-    """
-    Importa questões no formato padronizado.
-    Cada questão deve ser um dicionário com as chaves:
-    enunciado, a, b, c, d, e, gabarito, imagens, tipo
-    """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
+def _question_rows(questions, fonte, fonte_from_rows=False):
+    """Converte os dicionários de questão em tuplas prontas para o INSERT"""
     for q in questions:
-        enunciado = q.get('enunciado', '')
-        a = q.get('a', '')
-        b = q.get('b', '')
-        c = q.get('c', '')
-        d = q.get('d', '')
-        e = q.get('e', '')
-        gabarito = q.get('gabarito', '')
-        tipo = q.get('tipo', 'completa')
-
         # 🔧 Padroniza imagens: sempre JSON válido
         imagens = q.get('imagens') or []
         if not isinstance(imagens, str):
@@ -53,13 +44,97 @@ def import_questions(questions, fonte="Importação"):
             except Exception:
                 imagens = '[]'
 
-        cursor.execute('''
-            INSERT INTO questoes (enunciado, a, b, c, d, e, gabarito, fonte, imagens, tipo)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (enunciado, a, b, c, d, e, gabarito, fonte, imagens, tipo))
+        yield (
+            q.get('enunciado', ''),
+            q.get('a', ''), q.get('b', ''), q.get('c', ''), q.get('d', ''), q.get('e', ''),
+            q.get('gabarito', ''),
+            (q.get('fonte') or fonte) if fonte_from_rows else fonte,
+            imagens,
+            q.get('tipo', 'completa'),
+        )
 
-    conn.commit()
-    conn.close()
+
+def _drop_catalog_triggers(cursor):
+    """Remove os triggers de versão do catálogo existentes; retorna seus nomes"""
+    placeholders = ','.join('?' * len(CATALOG_TRIGGERS))
+    names = [row[0] for row in cursor.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})",
+        tuple(CATALOG_TRIGGERS),
+    )]
+    for name in names:
+        cursor.execute(f'DROP TRIGGER {name}')
+    return names
+
+
+def bulk_import_questions(questions, fonte="Importação", batch_size=BATCH_SIZE, db_path=DB_PATH,
+                          fonte_from_rows=False):
+    """
+    Importa em massa questões vindas de qualquer iterável (inclusive geradores).
+    As questões são inseridas em lotes de `batch_size` com executemany, todas
+    numa única transação. Todas recebem `fonte`; com `fonte_from_rows=True`
+    uma questão com a chave 'fonte' a sobrepõe, para carregar várias provas
+    de uma vez.
+    Durante a carga `synchronous` fica desligado e, fora do modo WAL, o journal
+    fica em memória; as configurações anteriores são restauradas no final.
+    Retorna o número de questões inseridas.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    cursor = conn.cursor()
+    synchronous = cursor.execute('PRAGMA synchronous').fetchone()[0]
+    journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+
+    started = time.perf_counter()
+    total = 0
+    try:
+        cursor.execute('PRAGMA synchronous = OFF')
+        if journal_mode.lower() != 'wal':
+            # Trocar o modo de um banco em WAL afetaria os outros processos
+            cursor.execute('PRAGMA journal_mode = MEMORY')
+
+        rows = _question_rows(questions, fonte, fonte_from_rows)
+        cursor.execute('BEGIN')
+        try:
+            # Os triggers do catálogo fariam um UPDATE em catalog_meta por
+            # linha; durante a carga saem e a versão sobe uma vez só. DDL é
+            # transacional no SQLite: um ROLLBACK devolve os triggers.
+            catalog_triggers = _drop_catalog_triggers(cursor)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                cursor.executemany('''
+                    INSERT INTO questoes (enunciado, a, b, c, d, e, gabarito, fonte, imagens, tipo)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', batch)
+                total += len(batch)
+            if catalog_triggers:
+                if total:
+                    cursor.execute('UPDATE catalog_meta SET version = version + 1 WHERE id = 1')
+                for name in catalog_triggers:
+                    cursor.execute(CATALOG_TRIGGERS[name])
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+    finally:
+        if journal_mode.lower() != 'wal':
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+        cursor.execute(f'PRAGMA synchronous = {synchronous}')
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed > 0 else float(total)
+    print(f"✅ {total} questões importadas em {elapsed:.2f}s ({rate:.0f} questões/s)")
+    return total
+
+
+def import_questions(questions, fonte="Importação"):
+    """
+    Importa questões no formato padronizado.
+    Cada questão deve ser um dicionário com as chaves:
+    enunciado, a, b, c, d, e, gabarito, imagens, tipo
+    """
+    return bulk_import_questions(questions, fonte=fonte, db_path=DB_PATH)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,208 @@
+from db_pool import DB_PATH, get_pool
+from question_catalog import get_catalog
+
+# Quantidade de simulados recentes usados na média móvel e na tendência
+ROLLING_WINDOW = 10
+
+ANALYTICS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id TEXT PRIMARY KEY,
+        total_simulados INTEGER NOT NULL DEFAULT 0,
+        total_questoes INTEGER NOT NULL DEFAULT 0,
+        total_acertos INTEGER NOT NULL DEFAULT 0,
+        total_segundos INTEGER NOT NULL DEFAULT 0,
+        questoes_cronometradas INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS user_block_stats (
+        user_id TEXT NOT NULL,
+        bloco INTEGER NOT NULL,
+        questoes INTEGER NOT NULL DEFAULT 0,
+        acertos INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, bloco)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS user_exam_stats (
+        user_id TEXT NOT NULL,
+        fonte TEXT NOT NULL,
+        questoes INTEGER NOT NULL DEFAULT 0,
+        acertos INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, fonte)
+    ) WITHOUT ROWID;
+'''
+
+
+def _rate(acertos, questoes):
+    return round(acertos / questoes * 100, 2) if questoes else 0
+
+
+class UserAnalytics:
+    """Agregados de desempenho por usuário, mantidos a cada resultado gravado.
+
+    `user_stats` guarda os totais do usuário, `user_block_stats` os acertos
+    por bloco e `user_exam_stats` os acertos por prova de origem de cada
+    questão. Na criação das tabelas os agregados são calculados a partir
+    das respostas já gravadas em `simulado_answers`.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.pool = get_pool(db_path)
+        self.catalog = get_catalog(db_path)
+        self.create_tables()
+
+    def create_tables(self):
+        """Cria as tabelas de analytics e faz o preenchimento inicial (uma vez)"""
+        conn = self.pool.get()
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'").fetchone():
+            return
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Outro worker pode ter criado as tabelas enquanto esperávamos o lock
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'"
+            ).fetchone()
+            for statement in ANALYTICS_SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            if not exists:
+                self._backfill(conn)
+
+    def _backfill(self, conn):
+        conn.execute('''
+            INSERT INTO user_stats
+            (user_id, total_simulados, total_questoes, total_acertos, total_segundos, questoes_cronometradas)
+            SELECT user_id, COUNT(*), COALESCE(SUM(num_questoes), 0), COALESCE(SUM(acertos), 0),
+                   SUM(COALESCE(duration_seconds, 0)),
+                   SUM(CASE WHEN duration_seconds IS NOT NULL THEN num_questoes ELSE 0 END)
+            FROM simulados
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id
+        ''')
+        conn.execute('''
+            INSERT INTO user_block_stats (user_id, bloco, questoes, acertos)
+            SELECT s.user_id, a.bloco, COUNT(*), SUM(a.correta)
+            FROM simulado_answers a JOIN simulados s ON s.id = a.simulado_id
+            WHERE s.user_id IS NOT NULL AND a.bloco IS NOT NULL AND a.correta IS NOT NULL
+            GROUP BY s.user_id, a.bloco
+        ''')
+        # Banco novo ou vazio: sem `questoes` não há prova de origem a agregar
+        has_questions = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questoes'"
+        ).fetchone()
+        if has_questions:
+            self._backfill_exams(conn)
+        users = conn.execute('SELECT COUNT(*) FROM user_stats').fetchone()[0]
+        if users:
+            print(f"📈 Analytics calculados para {users} usuários")
+
+    def _backfill_exams(self, conn):
+        conn.execute('''
+            INSERT INTO user_exam_stats (user_id, fonte, questoes, acertos)
+            SELECT s.user_id, q.fonte, COUNT(*), SUM(a.correta)
+            FROM simulado_answers a
+            JOIN simulados s ON s.id = a.simulado_id
+            JOIN questoes q ON q.id = a.questao_id
+            WHERE s.user_id IS NOT NULL AND a.correta IS NOT NULL
+            GROUP BY s.user_id, q.fonte
+        ''')
+
+    def rebuild(self, conn):
+        """Recalcula os agregados do zero (ex.: após recorrigir resultados)"""
+        for table in ('user_stats', 'user_block_stats', 'user_exam_stats'):
+            conn.execute(f'DELETE FROM {table}')
+        self._backfill(conn)
+
+    def record(self, conn, user_id, num_questoes, acertos, seconds, details=None):
+        """Soma um resultado aos agregados do usuário (na transação de `conn`)"""
+        if not user_id:
+            return
+        conn.execute('''
+            INSERT INTO user_stats
+            (user_id, total_simulados, total_questoes, total_acertos, total_segundos, questoes_cronometradas)
+            VALUES (?, 1, ?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_simulados = total_simulados + 1,
+                total_questoes = total_questoes + excluded.total_questoes,
+                total_acertos = total_acertos + excluded.total_acertos,
+                total_segundos = total_segundos + excluded.total_segundos,
+                questoes_cronometradas = questoes_cronometradas + excluded.questoes_cronometradas
+        ''', (user_id, num_questoes or 0, acertos or 0, seconds or 0, 0 if seconds is None else num_questoes or 0))
+
+        questions = (details or {}).get('questions') if isinstance(details, dict) else None
+        if not questions:
+            return
+        catalog = self.catalog.snapshot()
+        blocks = {}
+        exams = {}
+        for q in questions:
+            correct = int(bool(q.get('correta')))
+            bloco = q.get('bloco')
+            if bloco is not None:
+                totals = blocks.setdefault(bloco, [0, 0])
+                totals[0] += 1
+                totals[1] += correct
+            question = catalog.get(q.get('id'))
+            if question is not None:
+                totals = exams.setdefault(question['fonte'], [0, 0])
+                totals[0] += 1
+                totals[1] += correct
+        conn.executemany('''
+            INSERT INTO user_block_stats (user_id, bloco, questoes, acertos) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, bloco) DO UPDATE SET
+                questoes = questoes + excluded.questoes,
+                acertos = acertos + excluded.acertos
+        ''', [(user_id, bloco, total, correct) for bloco, (total, correct) in blocks.items()])
+        conn.executemany('''
+            INSERT INTO user_exam_stats (user_id, fonte, questoes, acertos) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, fonte) DO UPDATE SET
+                questoes = questoes + excluded.questoes,
+                acertos = acertos + excluded.acertos
+        ''', [(user_id, fonte, total, correct) for fonte, (total, correct) in exams.items()])
+
+    def summary(self, user_id, window=ROLLING_WINDOW):
+        """Resumo de desempenho do usuário em um único objeto pequeno"""
+        conn = self.pool.get()
+        totals = conn.execute('SELECT * FROM user_stats WHERE user_id = ?', (user_id,)).fetchone() if user_id else None
+        recent = []
+        blocks = []
+        exams = []
+        if totals is not None:
+            recent = conn.execute('''
+                SELECT id, data_criacao, percentual_acerto FROM simulados
+                WHERE user_id = ?
+                ORDER BY data_criacao DESC, id DESC
+                LIMIT ?
+            ''', (user_id, window)).fetchall()
+            blocks = conn.execute(
+                'SELECT bloco, questoes, acertos FROM user_block_stats WHERE user_id = ? ORDER BY bloco',
+                (user_id,),
+            ).fetchall()
+            exams = conn.execute(
+                'SELECT fonte, questoes, acertos FROM user_exam_stats WHERE user_id = ? ORDER BY fonte DESC',
+                (user_id,),
+            ).fetchall()
+
+        total_questoes = totals['total_questoes'] if totals else 0
+        cronometradas = totals['questoes_cronometradas'] if totals else 0
+        trend = [
+            {'id': row['id'], 'data_criacao': row['data_criacao'], 'percentual_acerto': round(row['percentual_acerto'] or 0, 2)}
+            for row in reversed(recent)
+        ]
+        return {
+            'total_simulados': totals['total_simulados'] if totals else 0,
+            'total_questoes': total_questoes,
+            'total_acertos': totals['total_acertos'] if totals else 0,
+            'percentual_acerto': _rate(totals['total_acertos'], total_questoes) if totals else 0,
+            'media_movel': round(sum(t['percentual_acerto'] for t in trend) / len(trend), 2) if trend else 0,
+            'janela_media_movel': window,
+            'tendencia': trend,
+            'tempo_medio_por_questao': round(totals['total_segundos'] / cronometradas, 1) if cronometradas else 0,
+            'blocos': [
+                {'bloco': row['bloco'], 'questoes': row['questoes'], 'acertos': row['acertos'],
+                 'percentual': _rate(row['acertos'], row['questoes'])}
+                for row in blocks
+            ],
+            'provas': [
+                {'fonte': row['fonte'], 'questoes': row['questoes'], 'acertos': row['acertos'],
+                 'percentual': _rate(row['acertos'], row['questoes'])}
+                for row in exams
+            ],
+        }
@@ -0,0 +1,15 @@
+"""
+Ponto de entrada WSGI.
+
+    gunicorn wsgi:app                                   # workers síncronos
+    gunicorn -k gevent --worker-connections 500 wsgi:app  # muitas conexões ociosas por worker
+
+No modo gevent as views rodam em até DB_WORKERS threads reais
+(db_executor.BlockingExecutor); o esquema do banco é preparado uma vez,
+na criação do app (use --preload para fazê-lo só no processo mestre).
+O gevent vem de requirements-async.txt.
+"""
+
+from app import create_app
+
+app = create_app()